@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class AdmissionError(Exception):
+    """A request refused before it reached Temporal, the client may retry after retry_after seconds"""
+
+    code = "rejected"
+
+    def __init__(self, message: str, retry_after: float, reason: str) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason  # metric label: which limit refused it
+
+
+class RateLimited(AdmissionError):
+    code = "rate_limited"
+
+
+class Overloaded(AdmissionError):
+    code = "overloaded"
+
+
+class TokenBucket:
+    """Allows burst requests at once, refilled at rate requests per second"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1.0) -> float:
+        """Take cost tokens. Returns 0 if they were taken, otherwise the seconds until they would be."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One token bucket per key (player, room, ...). Buckets are kept for the
+    most recently seen max_keys keys; a bucket that is dropped was idle
+    longest, and most likely full again anyway. A rate of 0 disables the limit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float,
+        max_keys: int = 100000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, key: str, cost: float = 1.0) -> None:
+        """Take cost tokens from key's bucket, or raise RateLimited"""
+        if self.rate <= 0:
+            return
+        now = self._clock()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        wait = bucket.take(now, cost)
+        if wait:
+            raise RateLimited(
+                f"Too many requests for this {self.name}, retry in {wait:.1f}s", wait, f"{self.name}_rate_limit"
+            )
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the Temporal RPCs in flight from this process. Callers beyond
+    max_in_flight wait, at most max_waiting of them and for at most
+    max_wait seconds each; the rest are shed with Overloaded instead of
+    queueing without bound, so latency stays flat for the requests let
+    through. A max_in_flight of 0 disables the limit.
+
+        async with limiter:
+            await handle.query(...)
+    """
+
+    def __init__(self, max_in_flight: int, max_waiting: int, max_wait: float) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+
+    async def __aenter__(self) -> None:
+        if self._semaphore is None:
+            return
+        if self._semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                raise Overloaded("Server is overloaded, retry shortly", self.max_wait, "overloaded")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                raise Overloaded("Server is overloaded, retry shortly", self.max_wait, "overloaded") from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+
+    async def __aexit__(self, *exc_info) -> Optional[bool]:
+        if self._semaphore is None:
+            return None
+        self.in_flight -= 1
+        self._semaphore.release()
+        return None
@@ -0,0 +1,147 @@
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import sqlite3
+from typing import AsyncIterator, List, Optional, Tuple
+
+from models import GameRecord
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_PATH = "game_archive.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_id TEXT NOT NULL UNIQUE,
+    room_id TEXT NOT NULL,
+    finished_at INTEGER NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_room_id ON games (room_id);
+"""
+
+
+def archive_path() -> str:
+    """Archive file shared by the worker (writes) and the server (exports)"""
+    return os.environ.get("GAME_ARCHIVE_PATH", DEFAULT_ARCHIVE_PATH)
+
+
+class GameArchive:
+    """
+    Append-only SQLite store of finished games.
+
+    Records are inserted in batches: append waits for the transaction that
+    carries its record, and records appended within flush_interval of each
+    other share that transaction (group commit). Inserts are idempotent on
+    game_id, so retried archive activities do not duplicate games.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 0.05) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[Tuple[tuple, asyncio.Future]] = []
+        self._ready = asyncio.Event()  # something to write
+        self._full = asyncio.Event()  # a whole batch to write
+        self._task: Optional[asyncio.Task] = None
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL lets the server export while workers write, and several worker processes share the file
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(SCHEMA)
+
+    async def append(self, record: GameRecord) -> None:
+        """Store a record, returns once it is committed"""
+        row = (
+            record.game_id,
+            record.room_id,
+            record.finished_at,
+            json.dumps(dataclasses.asdict(record), separators=(",", ":")),
+        )
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        self._ready.set()
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        await future
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._db.close()
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            if len(self._pending) < self.batch_size:
+                # Give concurrently finishing games a moment to join this transaction
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            if len(self._pending) < self.batch_size:
+                self._full.clear()
+            if not self._pending:
+                self._ready.clear()
+
+            try:
+                # SQLite blocks, keep it off the event loop
+                await asyncio.to_thread(self._write, [row for row, _ in batch])
+            except Exception as e:
+                logger.exception(f"Failed to archive {len(batch)} games")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def _write(self, rows: List[tuple]) -> None:
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO games (game_id, room_id, finished_at, record) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+
+async def export_records(
+    path: str,
+    room_id: Optional[str] = None,
+    after_seq: int = 0,
+    page_size: int = 500,
+) -> AsyncIterator[str]:
+    """
+    Archived games as NDJSON, one page at a time in archive order. Each line
+    carries its seq, pass the last one as after_seq to resume an export.
+    Records are streamed as stored, without decoding them.
+    """
+    if not os.path.exists(path):
+        return
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    query = "SELECT seq, record FROM games WHERE seq > ?"
+    if room_id is not None:
+        query += " AND room_id = ?"
+    query += " ORDER BY seq LIMIT ?"
+    try:
+        while True:
+            params = (after_seq, room_id, page_size) if room_id is not None else (after_seq, page_size)
+            rows = await asyncio.to_thread(lambda: db.execute(query, params).fetchall())
+            if not rows:
+                return
+            yield "".join(f'{{"seq":{seq},{record[1:]}\n' for seq, record in rows)
+            after_seq = rows[-1][0]
+    finally:
+        db.close()
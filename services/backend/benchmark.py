@@ -0,0 +1,390 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import socket
+import sys
+import time
+import uuid
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+import websockets
+from temporalio.api.enums.v1 import EventType
+from temporalio.client import Client
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Worker
+
+import server
+from activities import archive_game, check_game_state, validate_move
+from payload_converter import game_data_converter
+from workflows import GameRoomWorkflow, MatchmakerWorkflow
+
+
+TASK_QUEUE = "tic-tac-toe-task-queue"
+
+# Seconds between polls of a queued player's matchmaking status
+MATCH_POLL_INTERVAL = 0.2
+
+
+class LatencyStats:
+    """Latency samples and error counts per endpoint"""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, started: float) -> None:
+        self.samples[endpoint].append((time.perf_counter() - started) * 1000)
+
+    def error(self, endpoint: str) -> None:
+        self.errors[endpoint] += 1
+
+    def summary(self) -> Dict[str, Dict]:
+        result = {}
+        for endpoint in sorted(set(self.samples) | set(self.errors)):
+            samples = sorted(self.samples[endpoint])
+            result[endpoint] = {
+                "count": len(samples),
+                "errors": self.errors[endpoint],
+                "mean_ms": round(sum(samples) / len(samples), 3) if samples else None,
+                "p50_ms": percentile(samples, 50),
+                "p95_ms": percentile(samples, 95),
+                "p99_ms": percentile(samples, 99),
+            }
+        return result
+
+
+def percentile(sorted_samples: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of already sorted samples"""
+    if not sorted_samples:
+        return None
+    rank = max(1, -(-len(sorted_samples) * pct // 100))
+    return round(sorted_samples[int(rank) - 1], 3)
+
+
+def pick_move(rng: random.Random, board: List[List[Optional[str]]]):
+    empty = [(x, y) for y, row in enumerate(board) for x, cell in enumerate(row) if cell is None]
+    return rng.choice(empty)
+
+
+async def play_rest_game(http: httpx.AsyncClient, stats: LatencyStats, rng: random.Random, args) -> Optional[Dict]:
+    """One player pair creating, joining and playing a room through the REST endpoints"""
+    players = [f"bench-{uuid.uuid4().hex[:8]}", f"bench-{uuid.uuid4().hex[:8]}"]
+
+    started = time.perf_counter()
+    response = await http.post("/rooms", json={
+        "player_id": players[0], "board_size": args.board_size, "win_length": args.win_length,
+    })
+    if response.status_code != 200:
+        stats.error("create")
+        return None
+    stats.record("create", started)
+    room_id = response.json()["room_id"]
+
+    started = time.perf_counter()
+    response = await http.post(f"/rooms/{room_id}/join", json={"player_id": players[1]})
+    if response.status_code != 200:
+        stats.error("join")
+        return None
+    stats.record("join", started)
+    return await play_rest_moves(http, stats, rng, room_id, response.json()["state"])
+
+
+async def play_matchmaking_game(http: httpx.AsyncClient, stats: LatencyStats, rng: random.Random, args) -> List[Dict]:
+    """
+    Two players queuing through POST /matchmaking at the same time, polling
+    until matched, then playing over REST. They may be matched with players of
+    other pairs, so each room is played by whichever simulated player got X in it.
+    """
+    async def find_and_play(player_id: str) -> Optional[Dict]:
+        started = time.perf_counter()
+        response = await http.post("/matchmaking", json={
+            "player_id": player_id, "board_size": args.board_size, "win_length": args.win_length,
+        })
+        if response.status_code != 200:
+            stats.error("matchmaking")
+            return None
+        stats.record("matchmaking", started)
+
+        # The poll also picks the room up, so even a player matched right away polls once
+        matched = response.json()["status"] == "matched"
+        while True:
+            await asyncio.sleep(0 if matched else MATCH_POLL_INTERVAL)
+            started = time.perf_counter()
+            response = await http.get(f"/matchmaking/{player_id}")
+            if response.status_code != 200:
+                stats.error("match_poll")
+                return None
+            stats.record("match_poll", started)
+            if response.json()["status"] == "matched":
+                break
+        room_id = response.json()["room_id"]
+
+        response = await http.get(f"/rooms/{room_id}/state")
+        if response.status_code != 200:
+            stats.error("state")
+            return None
+        state = response.json()["state"]
+        if state["players"].get(player_id) != "X":
+            return None
+        return await play_rest_moves(http, stats, rng, room_id, state)
+
+    players = [f"bench-{uuid.uuid4().hex[:8]}", f"bench-{uuid.uuid4().hex[:8]}"]
+    games = await asyncio.gather(*(find_and_play(player_id) for player_id in players))
+    return [game for game in games if game]
+
+
+async def play_rest_moves(http: httpx.AsyncClient, stats: LatencyStats, rng: random.Random, room_id: str, state: Dict) -> Optional[Dict]:
+    moves = 0
+    while state["game_status"] == "active":
+        x, y = pick_move(rng, state["board"])
+        started = time.perf_counter()
+        response = await http.post(f"/rooms/{room_id}/move", json={
+            "player_id": state["current_turn"], "x": x, "y": y,
+        })
+        if response.status_code != 200:
+            stats.error("move")
+            return None
+        stats.record("move", started)
+        state = response.json()["state"]
+        moves += 1
+    return {"room_id": room_id, "moves": moves}
+
+
+async def play_ws_game(http: httpx.AsyncClient, ws_url: str, stats: LatencyStats, rng: random.Random, args) -> Optional[Dict]:
+    """
+    One player pair creating and joining over REST, then playing over the
+    room's WebSocket. A move's latency runs until the state_update carrying it
+    is pushed back.
+    """
+    players = [f"bench-{uuid.uuid4().hex[:8]}", f"bench-{uuid.uuid4().hex[:8]}"]
+
+    started = time.perf_counter()
+    response = await http.post("/rooms", json={
+        "player_id": players[0], "board_size": args.board_size, "win_length": args.win_length,
+    })
+    if response.status_code != 200:
+        stats.error("create")
+        return None
+    stats.record("create", started)
+    room_id = response.json()["room_id"]
+
+    async with websockets.connect(f"{ws_url}/ws/rooms/{room_id}") as ws:
+        started = time.perf_counter()
+        await ws.send(json.dumps({"action": "join", "player_id": players[1]}))
+        state = await wait_for_state(ws, after_version=-1)
+        if state is None:
+            stats.error("ws_join")
+            return None
+        stats.record("ws_join", started)
+
+        moves = 0
+        while state["game_status"] == "active":
+            x, y = pick_move(rng, state["board"])
+            started = time.perf_counter()
+            await ws.send(json.dumps({
+                "action": "move", "player_id": state["current_turn"], "x": x, "y": y,
+            }))
+            state = await wait_for_state(ws, after_version=state["version"])
+            if state is None:
+                stats.error("ws_move")
+                return None
+            stats.record("ws_move", started)
+            moves += 1
+    return {"room_id": room_id, "moves": moves}
+
+
+async def wait_for_state(ws, after_version: int) -> Optional[Dict]:
+    """Next pushed state newer than after_version, or None on an error frame. Answers heartbeats meanwhile."""
+    while True:
+        message = json.loads(await ws.recv())
+        if message["type"] == "ping":
+            await ws.send(json.dumps({"action": "pong"}))
+            continue
+        if message["type"] == "error":
+            return None
+        if message["type"] == "state_update" and message["state"]["version"] > after_version:
+            return message["state"]
+
+
+async def history_stats(client: Client, games: List[Dict]) -> Dict:
+    """History events and workflow tasks of the run that played each sampled game"""
+    events = 0
+    workflow_tasks = 0
+    moves = 0
+    for game in games:
+        history = await client.get_workflow_handle(f"tic-tac-toe-{game['room_id']}").fetch_history()
+        events += len(history.events)
+        workflow_tasks += sum(
+            1 for event in history.events if event.event_type == EventType.EVENT_TYPE_WORKFLOW_TASK_COMPLETED
+        )
+        moves += game["moves"]
+    return {
+        "sampled_games": len(games),
+        "history_events_per_game": round(events / len(games), 2) if games else None,
+        "workflow_tasks_per_move": round(workflow_tasks / moves, 3) if moves else None,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_environment(args, stack: AsyncExitStack) -> Client:
+    if args.address:
+        return await Client.connect(args.address, data_converter=game_data_converter())
+    if args.env == "time-skipping":
+        env = await WorkflowEnvironment.start_time_skipping(data_converter=game_data_converter())
+    else:
+        env = await WorkflowEnvironment.start_local(data_converter=game_data_converter())
+    await stack.enter_async_context(env)
+    return env.client
+
+
+async def run_benchmark(args) -> Dict:
+    async with AsyncExitStack() as stack:
+        client = await start_environment(args, stack)
+
+        if not args.external_worker:
+            await stack.enter_async_context(Worker(
+                client,
+                task_queue=TASK_QUEUE,
+                workflows=[GameRoomWorkflow, MatchmakerWorkflow],
+                activities=[validate_move, check_game_state, archive_game],
+            ))
+
+        # The API server runs in this process, on the benchmark's Temporal client
+        server.temporal_client = client
+        # Every simulated player connects from 127.0.0.1, so limits per client address would
+        # throttle the whole benchmark as if it were one client
+        server.address_limiter.rate = 0
+        server.read_limiter.rate = 0
+        port = free_port()
+        api = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning"))
+        api_task = asyncio.create_task(api.serve())
+        while not api.started:
+            await asyncio.sleep(0.05)
+
+        http = await stack.enter_async_context(httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        ))
+        ws_url = f"ws://127.0.0.1:{port}"
+
+        stats = LatencyStats()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def play(i: int):
+            async with semaphore:
+                rng = random.Random(args.seed + i)
+                use_ws = args.transport == "ws" or (args.transport == "mixed" and i % 2)
+                try:
+                    if args.transport == "matchmaking":
+                        return await play_matchmaking_game(http, stats, rng, args)
+                    if use_ws:
+                        return await play_ws_game(http, ws_url, stats, rng, args)
+                    return await play_rest_game(http, stats, rng, args)
+                except Exception as e:
+                    logging.warning(f"Game {i} failed: {e}")
+                    stats.error("game")
+                    return None
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(play(i) for i in range(args.pairs)))
+        duration = time.perf_counter() - started
+
+        # Matchmaking pairs report a list of the rooms they played
+        games = [
+            game for result in results if result
+            for game in (result if isinstance(result, list) else [result])
+        ]
+        moves = sum(game["moves"] for game in games)
+        report = {
+            "config": {
+                "env": "address" if args.address else args.env,
+                "pairs": args.pairs,
+                "concurrency": args.concurrency,
+                "transport": args.transport,
+                "board_size": args.board_size,
+                "win_length": args.win_length,
+                "seed": args.seed,
+            },
+            "duration_s": round(duration, 3),
+            "games_completed": len(games),
+            "moves": moves,
+            "moves_per_sec": round(moves / duration, 2) if duration else None,
+            "endpoints": stats.summary(),
+        }
+        report.update(await history_stats(client, games[:args.history_sample]))
+
+        api.should_exit = True
+        await api_task
+        return report
+
+
+def find_regressions(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """p95 latencies that grew, or throughput that dropped, by more than tolerance"""
+    regressions = []
+    for endpoint, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous or previous.get("p95_ms") is None or current["p95_ms"] is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{endpoint} p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+    if baseline.get("moves_per_sec") and report["moves_per_sec"] is not None:
+        if report["moves_per_sec"] < baseline["moves_per_sec"] * (1 - tolerance):
+            regressions.append(f"moves/sec {baseline['moves_per_sec']} -> {report['moves_per_sec']}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Drive simulated player pairs through the server and worker and report latency "
+        "percentiles per endpoint, moves/sec, workflow tasks per move and history events per game as JSON."
+    )
+    parser.add_argument("--env", choices=["local", "time-skipping"], default="local",
+                        help="WorkflowEnvironment to start in-process")
+    parser.add_argument("--address", help="Use an already running Temporal server instead of starting one")
+    parser.add_argument("--external-worker", action="store_true",
+                        help="Do not run a worker in-process, e.g. to measure worker.py processes")
+    parser.add_argument("--pairs", type=int, default=1000, help="Number of games to play")
+    parser.add_argument("--concurrency", type=int, default=100, help="Games played at the same time")
+    parser.add_argument("--transport", choices=["rest", "ws", "mixed", "matchmaking"], default="mixed")
+    parser.add_argument("--board-size", type=int, default=3)
+    parser.add_argument("--win-length", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="HTTP request timeout in seconds")
+    parser.add_argument("--history-sample", type=int, default=50, help="Games whose history is inspected")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON report to compare against, exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    report = await run_benchmark(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            logging.error(f"Regression: {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,257 @@
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from models import Board, cell_win_masks
+
+
+# Scores are from the point of view of the side to move
+WIN_SCORE = 1_000_000
+
+# Heuristic value of an open window holding n of one side's marks, and nothing of the other's
+WINDOW_SCORES = (0, 1, 10, 100, 1_000, 10_000, 100_000)
+
+# Transposition table flags
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    """
+    LRU cache of searched positions: canonical key -> (depth, flag, score).
+    Lives for the whole process, so positions seen in earlier moves and
+    other rooms are reused.
+    """
+
+    def __init__(self, max_entries: int = 500_000) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[int, int, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> Optional[Tuple[int, int, int]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, depth: int, flag: int, score: int) -> None:
+        self._entries[key] = (depth, flag, score)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+transposition_table = TranspositionTable()
+
+
+@lru_cache(maxsize=None)
+def symmetries(size: int) -> Tuple[Tuple[int, ...], ...]:
+    """The 8 rotations/reflections of the board, each as a cell -> cell mapping"""
+    def index(x, y):
+        return y * size + x
+    last = size - 1
+    transforms = (
+        lambda x, y: (x, y),
+        lambda x, y: (last - y, x),
+        lambda x, y: (last - x, last - y),
+        lambda x, y: (y, last - x),
+        lambda x, y: (last - x, y),
+        lambda x, y: (x, last - y),
+        lambda x, y: (y, x),
+        lambda x, y: (last - y, last - x),
+    )
+    return tuple(
+        tuple(index(*transform(cell % size, cell // size)) for cell in range(size * size))
+        for transform in transforms
+    )
+
+
+def _cells(bits: int) -> List[int]:
+    cells = []
+    while bits:
+        lowest = bits & -bits
+        cells.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return cells
+
+
+def canonical_key(x_bits: int, o_bits: int, size: int, win_length: int) -> tuple:
+    """Same key for all 8 symmetric variants of a position, so each is only searched once"""
+    x_cells = _cells(x_bits)
+    o_cells = _cells(o_bits)
+    best = None
+    for mapping in symmetries(size):
+        key = (
+            sum(1 << mapping[c] for c in x_cells),
+            sum(1 << mapping[c] for c in o_cells),
+        )
+        if best is None or key < best:
+            best = key
+    return (size, win_length) + best
+
+
+@lru_cache(maxsize=None)
+def all_windows(size: int, win_length: int) -> Tuple[int, ...]:
+    windows = set()
+    for y in range(size):
+        for x in range(size):
+            windows.update(cell_win_masks(size, win_length, x, y))
+    return tuple(windows)
+
+
+@lru_cache(maxsize=None)
+def neighbour_masks(size: int) -> Tuple[int, ...]:
+    """Per cell, the mask of the cells around it"""
+    masks = []
+    for cell in range(size * size):
+        x, y = cell % size, cell // size
+        mask = 0
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                nx, ny = x + dx, y + dy
+                if (dx or dy) and 0 <= nx < size and 0 <= ny < size:
+                    mask |= 1 << (ny * size + nx)
+        masks.append(mask)
+    return tuple(masks)
+
+
+class Search:
+    """Negamax with alpha-beta pruning and iterative deepening, for one move"""
+
+    def __init__(self, size: int, win_length: int, deadline: float, table: TranspositionTable) -> None:
+        self.size = size
+        self.win_length = win_length
+        self.cell_count = size * size
+        self.full = (1 << self.cell_count) - 1
+        self.deadline = deadline
+        self.table = table
+        self.nodes = 0
+        # Exhaustive on small boards, only cells next to existing marks on large ones
+        self.local_moves = self.cell_count > 16
+        center = (size - 1) / 2
+        self.center_order = sorted(
+            range(self.cell_count),
+            key=lambda c: abs(c % size - center) + abs(c // size - center),
+        )
+
+    def wins(self, bits: int, cell: int) -> bool:
+        return any(bits & mask == mask for mask in cell_win_masks(self.size, self.win_length, cell % self.size, cell // self.size))
+
+    def candidates(self, own: int, other: int) -> List[int]:
+        occupied = own | other
+        if not occupied:
+            return [self.center_order[0]]
+        if self.local_moves:
+            around = 0
+            neighbours = neighbour_masks(self.size)
+            for cell in _cells(occupied):
+                around |= neighbours[cell]
+            free = around & ~occupied
+        else:
+            free = self.full & ~occupied
+        moves = [c for c in self.center_order if free >> c & 1]
+        # Winning moves first, then moves that block the opponent's win
+        wins = [c for c in moves if self.wins(own | 1 << c, c)]
+        if wins:
+            return wins[:1]
+        blocks = [c for c in moves if self.wins(other | 1 << c, c)]
+        if blocks:
+            return blocks + [c for c in moves if c not in blocks]
+        return moves
+
+    def evaluate(self, own: int, other: int) -> int:
+        score = 0
+        for window in all_windows(self.size, self.win_length):
+            mine = own & window
+            theirs = other & window
+            if mine and not theirs:
+                score += WINDOW_SCORES[min(mine.bit_count(), 6)]
+            elif theirs and not mine:
+                score -= WINDOW_SCORES[min(theirs.bit_count(), 6)]
+        return score
+
+    def negamax(self, own: int, other: int, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes & 31 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        if (own | other) == self.full:
+            return 0
+        if depth == 0:
+            return self.evaluate(own, other)
+
+        # Side to move follows from the mark counts, so the key only needs the marks
+        x_bits, o_bits = (own, other) if own.bit_count() == other.bit_count() else (other, own)
+        key = canonical_key(x_bits, o_bits, self.size, self.win_length)
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth:
+            _, flag, score = entry
+            if flag == EXACT:
+                return score
+            if flag == LOWER:
+                alpha = max(alpha, score)
+            elif score <= alpha:
+                return score
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+
+        original_alpha = alpha
+        best = -WIN_SCORE
+        for cell in self.candidates(own, other):
+            placed = own | 1 << cell
+            if self.wins(placed, cell):
+                score = WIN_SCORE - ply
+            else:
+                score = -self.negamax(other, placed, depth - 1, -beta, -alpha, ply + 1)
+            if score > best:
+                best = score
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        flag = UPPER if best <= original_alpha else LOWER if best >= beta else EXACT
+        self.table.put(key, depth, flag, best)
+        return best
+
+    def best_move(self, own: int, other: int) -> int:
+        moves = self.candidates(own, other)
+        best_cell = moves[0]
+        if len(moves) == 1:
+            return best_cell
+        remaining = self.cell_count - (own | other).bit_count()
+        for depth in range(1, remaining + 1):
+            try:
+                depth_best = None
+                alpha = -WIN_SCORE - 1
+                for cell in moves:
+                    placed = own | 1 << cell
+                    if self.wins(placed, cell):
+                        return cell
+                    score = -self.negamax(other, placed, depth - 1, -WIN_SCORE - 1, -alpha, 1)
+                    if score > alpha:
+                        alpha, depth_best = score, cell
+            except SearchTimeout:
+                break
+            # Only a fully searched depth is trusted, and its best move is tried first next time
+            best_cell = depth_best
+            moves.remove(best_cell)
+            moves.insert(0, best_cell)
+            if abs(alpha) >= WIN_SCORE - self.cell_count:
+                break  # forced win or loss found
+        return best_cell
+
+
+def choose_move(board: Board, mark: str, budget_seconds: float, table: TranspositionTable = transposition_table) -> Tuple[int, int]:
+    """Best move for mark found within the time budget, as (x, y)"""
+    own, other = (board.x_bits, board.o_bits) if mark == "X" else (board.o_bits, board.x_bits)
+    search = Search(board.size, board.win_length, time.perf_counter() + budget_seconds, table)
+    cell = search.best_move(own, other)
+    return cell % board.size, cell // board.size
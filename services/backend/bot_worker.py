@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import signal
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from temporalio.client import Client
+from temporalio.runtime import Runtime
+from temporalio.worker import SharedStateManager, Worker
+
+from activities import compute_bot_move
+from payload_converter import game_data_converter
+from telemetry import ActivityMetricsInterceptor, temporal_interceptors, temporal_runtime
+from workflows import BOT_TASK_QUEUE
+
+
+@dataclass
+class BotWorkerConfig:
+    """Bot worker settings, each one can be set from the environment or the command line"""
+    address: str = "localhost:7233"
+    processes: int = field(default_factory=lambda: os.cpu_count() or 1)  # search processes, one move each at a time
+    graceful_shutdown_seconds: float = 5.0  # time in-flight searches get on shutdown
+    metrics_address: str = "127.0.0.1:9564"  # Prometheus endpoint, "" to disable
+
+
+async def run_bot_worker(config: BotWorkerConfig = BotWorkerConfig()):
+    logging.basicConfig(level=logging.INFO)
+
+    runtime = temporal_runtime(config.metrics_address)
+    client = await Client.connect(
+        config.address,
+        data_converter=game_data_converter(),
+        interceptors=temporal_interceptors(),
+        runtime=runtime,
+    )
+
+    # Searches are CPU bound: run them in a process pool, so they use every
+    # core and never block the worker's event loop. Each pool process keeps
+    # its own transposition table for as long as it lives.
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=config.processes)
+    logging.info(f"Starting bot worker (pid {os.getpid()}, {config.processes} processes) on {BOT_TASK_QUEUE}")
+    worker = Worker(
+        client,
+        task_queue=BOT_TASK_QUEUE,  # the queue rooms send bot moves to
+        activities=[compute_bot_move],
+        activity_executor=executor,
+        interceptors=[ActivityMetricsInterceptor((runtime or Runtime.default()).metric_meter)],
+        shared_state_manager=SharedStateManager.create_from_multiprocessing(multiprocessing.Manager()),
+        # Never take more moves than there are processes, queued moves wait on the task queue
+        max_concurrent_activities=config.processes,
+        graceful_shutdown_timeout=timedelta(seconds=config.graceful_shutdown_seconds),
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    with executor:
+        async with worker:
+            await stop.wait()
+            logging.info(f"Shutting down bot worker (pid {os.getpid()})")
+
+
+def parse_config() -> BotWorkerConfig:
+    defaults = BotWorkerConfig()
+    env = os.environ
+    parser = argparse.ArgumentParser(description="Temporal worker computing the tic-tac-toe bot's moves")
+    parser.add_argument("--address", default=env.get("TEMPORAL_ADDRESS", defaults.address))
+    parser.add_argument("--processes", type=int,
+                        default=int(env.get("BOT_WORKER_PROCESSES", defaults.processes)))
+    parser.add_argument("--graceful-shutdown-seconds", type=float,
+                        default=float(env.get("BOT_GRACEFUL_SHUTDOWN_SECONDS", defaults.graceful_shutdown_seconds)))
+    parser.add_argument("--metrics-address", default=env.get("BOT_METRICS_ADDRESS", defaults.metrics_address),
+                        help="host:port serving Prometheus metrics, empty to disable")
+    return BotWorkerConfig(**vars(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    asyncio.run(run_bot_worker(parse_config()))
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List
+
+from temporalio.client import Client, WorkflowUpdateFailedError, WorkflowUpdateRPCTimeoutOrCancelledError
+from temporalio.exceptions import ApplicationError
+from temporalio.service import RPCError, RPCStatusCode
+
+from models import GameState
+from workflows import ROOM_CONTINUING_ERROR, GameRoomWorkflow
+
+
+logger = logging.getLogger(__name__)
+
+StateListener = Callable[[str, GameState], Awaitable[None]]
+
+
+class ChangeFeed:
+    """
+    Follows the state transitions of rooms through the workflow's
+    wait_for_change long-poll update.
+
+    One follower task runs per subscribed room. Every new state version,
+    including changes the workflow makes on its own such as turn timeouts,
+    is handed to the listener in order. Rooms continue as new between games,
+    and the feed keeps following them across runs until the room closes or
+    is unsubscribed.
+    """
+
+    def __init__(self, client: Client, listener: StateListener, retry_delay: float = 1.0) -> None:
+        self._client = client
+        self._listener = listener
+        self._retry_delay = retry_delay
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def is_following(self, room_id: str) -> bool:
+        return room_id in self._tasks
+
+    def following(self) -> List[str]:
+        return list(self._tasks)
+
+    def subscribe(self, room_id: str, after_version: int = -1) -> None:
+        """Start following a room, unless it is already followed"""
+        if room_id in self._tasks:
+            return
+        task = asyncio.create_task(self._follow(room_id, after_version))
+        task.add_done_callback(lambda _: self._tasks.pop(room_id, None))
+        self._tasks[room_id] = task
+
+    def unsubscribe(self, room_id: str) -> None:
+        task = self._tasks.pop(room_id, None)
+        if task:
+            task.cancel()
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _follow(self, room_id: str, after_version: int) -> None:
+        handle = self._client.get_workflow_handle(f"tic-tac-toe-{room_id}")
+        while True:
+            try:
+                state = await handle.execute_update(GameRoomWorkflow.wait_for_change, after_version)
+            except WorkflowUpdateFailedError as e:
+                if isinstance(e.cause, ApplicationError) and e.cause.type == ROOM_CONTINUING_ERROR:
+                    # The run is handing over, the next one continues from this version
+                    await asyncio.sleep(self._retry_delay)
+                    continue
+                # Rejected by the validator: the room is closed and nothing newer will come
+                return
+            except WorkflowUpdateRPCTimeoutOrCancelledError as e:
+                if asyncio.current_task().cancelling():
+                    # Unsubscribed or closing: the SDK reports our own cancellation as this error
+                    raise asyncio.CancelledError() from e
+                # Nothing changed within the RPC deadline, poll again
+                continue
+            except RPCError as e:
+                if e.status == RPCStatusCode.NOT_FOUND:
+                    # Unknown room, or the workflow has already completed
+                    return
+                logger.warning(f"Change feed for room {room_id} failed, retrying: {e}")
+                await asyncio.sleep(self._retry_delay)
+                continue
+
+            after_version = state.version
+            try:
+                await self._listener(room_id, state)
+            except Exception:
+                logger.exception(f"Change feed listener failed for room {room_id}")
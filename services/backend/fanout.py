@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from serialization import OutgoingMessage, Payload
+
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to consumers evicted for being too slow (RFC 6455 "Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Close code sent to clients that stopped answering heartbeats (RFC 6455 "Going Away")
+HEARTBEAT_TIMEOUT_CLOSE_CODE = 1001
+
+
+class ConnectionSender:
+    """
+    Bounded outbound queue and sender task for one WebSocket.
+
+    Broadcasts only enqueue, so a slow socket never stalls the others in
+    its room. Messages sharing a coalesce key replace each other while they
+    wait, so a lagging client skips straight to the latest state. When the
+    queue is full new messages are dropped, and a consumer that keeps
+    dropping messages or takes longer than send_timeout for a single send
+    is closed.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_close: Callable[["ConnectionSender"], None],
+        role: str = "player",
+        delta: bool = False,
+        binary: bool = False,
+        max_queue: int = 32,
+        max_dropped: int = 64,
+        send_timeout: float = 5.0,
+    ) -> None:
+        self.websocket = websocket
+        self.role = role
+        self.delta = delta  # receives snapshot + delta messages instead of full states
+        self.binary = binary  # MessagePack binary frames instead of JSON text frames
+        self.max_queue = max_queue
+        self.max_dropped = max_dropped
+        self.send_timeout = send_timeout
+        self.dropped = 0  # consecutive drops, reset once the queue drains
+        self.closed = False
+        self.last_seen = time.monotonic()  # last message from the client, pongs included
+        self._on_close = on_close
+        self._queue: Deque[Tuple[Payload, Optional[str]]] = deque()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def offer(self, payload: Payload, coalesce_key: Optional[str] = None) -> bool:
+        """Queue an already encoded message without waiting. Returns whether it was queued."""
+        if self.closed:
+            return False
+        if coalesce_key is not None:
+            for i, (_, key) in enumerate(self._queue):
+                if key == coalesce_key:
+                    # Latest state wins
+                    self._queue[i] = (payload, coalesce_key)
+                    return True
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            if self.dropped > self.max_dropped:
+                self.evict(f"dropped {self.dropped} messages in a row")
+            return False
+        self._queue.append((payload, coalesce_key))
+        self._ready.set()
+        return True
+
+    async def send_message(self, message: Union[Dict, OutgoingMessage]) -> None:
+        """Queue a message for this connection only"""
+        if not isinstance(message, OutgoingMessage):
+            message = OutgoingMessage(message)
+        self.offer(message.encoded(self.binary))
+
+    def close(self) -> None:
+        self._task.cancel()
+
+    def evict(self, reason: str, code: int = SLOW_CONSUMER_CLOSE_CODE) -> None:
+        """Close the socket, the sender's on_close then drops it from its room"""
+        logger.warning(f"Evicting WebSocket consumer: {reason}")
+        self.closed = True
+        self._queue.clear()
+        if asyncio.current_task() is not self._task:
+            self._task.cancel()
+        asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            await self.websocket.close(code=code)
+        except RuntimeError:  # Connection already closed
+            pass
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    payload, _ = self._queue.popleft()
+                    send = self.websocket.send_bytes(payload) if self.binary else self.websocket.send_text(payload)
+                    await asyncio.wait_for(send, self.send_timeout)
+                self._ready.clear()
+                self.dropped = 0
+        except asyncio.TimeoutError:
+            self.evict(f"send took longer than {self.send_timeout}s")
+        except asyncio.CancelledError:
+            pass
+        except Exception:  # Connection already closed
+            pass
+        finally:
+            self.closed = True
+            self._on_close(self)
+
+
+def broadcast(senders, message: Union[Dict, OutgoingMessage], coalesce_key: Optional[str] = None) -> int:
+    """Encode a message once per wire format and queue it on every sender. Returns how many queued it."""
+    if not isinstance(message, OutgoingMessage):
+        message = OutgoingMessage(message)
+    return sum(sender.offer(message.encoded(sender.binary), coalesce_key) for sender in list(senders))
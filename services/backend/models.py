@@ -0,0 +1,239 @@
+# Game types shared by the server, the worker and the workflows. Only depends on the
+# standard library, so the workflow sandbox can pass it through instead of
+# re-importing it for every workflow run.
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+
+# Player ID of the computer opponent in single-player rooms
+BOT_PLAYER_ID = "bot"
+
+# Directions of the four lines through a cell: row, column, diagonal, anti-diagonal
+LINE_DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+@lru_cache(maxsize=None)
+def cell_win_masks(size: int, win_length: int, x: int, y: int) -> Tuple[int, ...]:
+    """
+    Bitmasks of every winning window of win_length cells that goes through (x, y).
+    There are at most 4 * win_length of them, so checking a move is O(k).
+    """
+    masks = []
+    for dx, dy in LINE_DIRECTIONS:
+        for offset in range(win_length):
+            start_x, start_y = x - offset * dx, y - offset * dy
+            end_x, end_y = start_x + (win_length - 1) * dx, start_y + (win_length - 1) * dy
+            if not (0 <= start_x < size and 0 <= end_x < size and 0 <= start_y < size and 0 <= end_y < size):
+                continue
+            masks.append(sum(
+                1 << ((start_y + i * dy) * size + start_x + i * dx) for i in range(win_length)
+            ))
+    return tuple(masks)
+
+
+@dataclass
+class Board:
+    # One bitmask per mark, cell (x, y) is bit y * size + x
+    x_bits: int = 0
+    o_bits: int = 0
+    size: int = 3
+    win_length: int = 3
+    occupied: int = 0  # number of marks placed, for O(1) draw detection
+    
+    @classmethod
+    def new_board(cls, size: int = 3, win_length: int = 3) -> "Board":
+        return cls(size=size, win_length=win_length)
+    
+    @classmethod
+    def from_grid(cls, grid: List[List[Optional[str]]], win_length: int = 3) -> "Board":
+        """Build a board from the row-major grid format used on the wire."""
+        board = cls.new_board(len(grid), win_length)
+        for y, row in enumerate(grid):
+            for x, cell in enumerate(row):
+                if cell is not None:
+                    board.place(x, y, cell)
+        return board
+    
+    @property
+    def grid(self) -> List[List[Optional[str]]]:
+        """Row-major grid view of the board, the format used on the wire."""
+        return [[self.get(x, y) for x in range(self.size)] for y in range(self.size)]
+    
+    def get(self, x: int, y: int) -> Optional[str]:
+        bit = 1 << (y * self.size + x)
+        if self.x_bits & bit:
+            return "X"
+        if self.o_bits & bit:
+            return "O"
+        return None
+    
+    def place(self, x: int, y: int, mark: str) -> None:
+        bit = 1 << (y * self.size + x)
+        if mark == "X":
+            self.x_bits |= bit
+        else:
+            self.o_bits |= bit
+        self.occupied += 1
+    
+    def is_valid_move(self, x: int, y: int) -> bool:
+        """Check if a move is valid (within bounds and on an empty cell)."""
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            return False
+        return not (self.x_bits | self.o_bits) & (1 << (y * self.size + x))
+    
+    def check_game_state(self, x: int, y: int, player: str) -> str:
+        """
+        Check if the game has reached a terminal state after the last move.
+        Pure and deterministic, so it is safe to call from workflow code.
+        Returns: "ongoing", "win", or "draw"
+        """
+        bits = self.x_bits if player == "X" else self.o_bits
+        
+        # Only the lines through the last move can have been completed by it
+        if any(bits & mask == mask for mask in cell_win_masks(self.size, self.win_length, x, y)):
+            return "win"
+        
+        # Check for draw (board is full)
+        if self.occupied == self.size * self.size:
+            return "draw"
+        
+        return "ongoing"
+
+
+@dataclass
+class CheckMoveInput:
+    board: Board
+    player: str
+    x: int
+    y: int
+
+
+@dataclass
+class CheckGameStateInput:
+    board: Board
+    last_move_x: int
+    last_move_y: int
+    last_move_player: str
+
+
+@dataclass
+class GameState:
+    board: Board
+    players: Dict[str, str]  # player_id -> mark (X or O)
+    current_turn: Optional[str]  # player_id of whose turn it is
+    game_status: str  # "waiting", "active", "finished", or "expired" when nobody joined in time
+    winner: Optional[str] = None  # player_id of winner, if any
+    move_deadline: Optional[str] = None  # ISO format string of deadline time
+    version: int = 0  # incremented on every state change, lets readers cache and order states
+    best_of: int = 1  # games in the match
+    game_number: int = 1  # current game within the match
+    scores: Dict[str, int] = field(default_factory=dict)  # player_id -> games won in the match
+    rematch_requests: List[str] = field(default_factory=list)  # players asking for another match
+    move_deadline_ms: Optional[int] = None  # epoch milliseconds the current player must move by
+    clocks_ms: Dict[str, int] = field(default_factory=dict)  # player_id -> time left in the bank, chess-clock rooms only
+    recent_move_ids: List[str] = field(default_factory=list)  # client move IDs of the latest moves applied, oldest first
+    lobby_deadline_ms: Optional[int] = None  # epoch milliseconds a waiting room closes at unless someone joins
+
+
+@dataclass
+class CreateRoomInput:
+    creator_id: str
+    room_id: str  # Add room_id to input parameters
+    rules_mode: str = "inline"  # "inline" or "activity" (opt-in, for rules with side effects)
+    board_size: int = 3  # N for an N x N board
+    win_length: int = 3  # marks in a row needed to win
+    best_of: int = 1  # play a best-of-N match in this room
+    max_history_events: int = 2000  # continue as new once the history grows past this
+    # Carried over by continue-as-new
+    players: Optional[Dict[str, str]] = None  # both players, for the next game of a match
+    scores: Optional[Dict[str, int]] = None
+    game_number: int = 1
+    version: int = 0
+    resume_state: Optional[GameState] = None  # game in progress, when continued for history size
+    opponent_id: Optional[str] = None  # second player, for rooms started by the matchmaker
+    move_log: Optional[List[int]] = None  # cells played so far, carried with resume_state
+    vs_bot: bool = False  # single-player room against the bot
+    bot_move_budget_ms: int = 1000  # time the bot may take per move, including queueing
+    clock_ms: int = 0  # chess clock: time bank per player for the whole game, 0 for a fixed time per move
+    increment_ms: int = 0  # chess clock: added to a player's bank after each of their moves
+    recent_move_ids: Optional[List[str]] = None  # carried into the next game, so late retries are still recognised
+    lobby_ttl_ms: int = 0  # close the room if nobody joins within this time, 0 to wait forever
+
+
+@dataclass
+class JoinRoomInput:
+    room_id: str
+    player_id: str
+
+
+@dataclass
+class MoveInput:
+    room_id: str
+    player_id: str
+    x: int
+    y: int
+    move_id: Optional[str] = None  # client-chosen, the same for every retry of one move
+
+
+@dataclass
+class MatchmakingInput:
+    player_id: str
+    board_size: int = 3
+    win_length: int = 3
+    best_of: int = 1
+    room_shards: int = 1  # shard count of the server that queued the player, see sharding.py
+
+
+@dataclass
+class MatchAssignment:
+    player_id: str
+    status: str  # "queued", "matched", or "not_queued" for players the matchmaker does not know
+    room_id: Optional[str] = None  # set once matched
+    queue_depth: int = 0  # players waiting for the same kind of room
+    queue_position: int = 0  # 1 for the next player to be paired, while queued
+
+
+@dataclass
+class MatchmakerInput:
+    # Carried over by continue-as-new
+    queues: Dict[str, List[MatchmakingInput]] = field(default_factory=dict)
+    assignments: Dict[str, str] = field(default_factory=dict)  # player_id -> room_id, not yet picked up
+    matches_started: int = 0
+    max_history_events: int = 10000  # continue as new once the history grows past this
+
+
+@dataclass
+class MatchmakerStats:
+    queue_depth: Dict[str, int]  # waiting players per kind of room
+    waiting: int
+    matches_started: int
+
+
+@dataclass
+class GameRecord:
+    """Compact move log of a finished game, as archived"""
+    game_id: str  # run ID of the workflow run that finished the game
+    room_id: str
+    game_number: int
+    best_of: int
+    board_size: int
+    win_length: int
+    players: Dict[str, str]  # player_id -> mark
+    moves: List[int]  # cells in play order, y * board_size + x; X moves first
+    winner: Optional[str]
+    result: str  # "win", "draw" or "timeout"
+    finished_at: int  # epoch milliseconds
+
+
+@dataclass
+class BotMoveInput:
+    board: Board
+    mark: str  # the bot's mark
+    budget_ms: int  # search time
+
+
+@dataclass
+class BotMove:
+    x: int
+    y: int
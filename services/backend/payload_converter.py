@@ -0,0 +1,345 @@
+import dataclasses
+import os
+import struct
+import typing
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import (
+    CompositePayloadConverter,
+    DataConverter,
+    DefaultPayloadConverter,
+    EncodingPayloadConverter,
+    JSONPlainPayloadConverter,
+    JSONTypeConverter,
+)
+
+from models import (
+    Board,
+    BotMove,
+    BotMoveInput,
+    CheckGameStateInput,
+    CheckMoveInput,
+    CreateRoomInput,
+    GameRecord,
+    GameState,
+    JoinRoomInput,
+    MatchAssignment,
+    MatchmakerInput,
+    MatchmakerStats,
+    MatchmakingInput,
+    MoveInput,
+)
+
+
+COMPACT_ENCODING = "binary/tic-tac-toe"
+
+# Format version, first byte of every payload
+FORMAT_VERSION = 1
+
+# Types with a compact encoding. Their tag is the position in this list, so
+# only ever append to it. Fields are written in declaration order: new fields
+# must be added at the end of a dataclass, with a default, so older payloads
+# still decode.
+GAME_TYPES: List[Type] = [
+    Board,
+    GameState,
+    CreateRoomInput,
+    JoinRoomInput,
+    MoveInput,
+    CheckMoveInput,
+    CheckGameStateInput,
+    MatchmakingInput,
+    MatchAssignment,
+    MatchmakerInput,
+    MatchmakerStats,
+    GameRecord,
+    BotMoveInput,
+    BotMove,
+]
+
+Encoder = Callable[[Any, bytearray, Dict[str, int]], None]
+Decoder = Callable[[bytes, int, List[str]], Tuple[Any, int]]
+
+_DOUBLE = struct.Struct("<d")
+
+
+def _write_uint(out: bytearray, n: int) -> None:
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_uint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _encode_int(value: int, out: bytearray, strings: Dict[str, int]) -> None:
+    # Zigzag, so small negative numbers stay small too
+    _write_uint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+
+
+def _decode_int(data: bytes, pos: int, strings: List[str]) -> Tuple[int, int]:
+    n, pos = _read_uint(data, pos)
+    return (n >> 1 if not n & 1 else -((n + 1) >> 1)), pos
+
+
+def _encode_bool(value: bool, out: bytearray, strings: Dict[str, int]) -> None:
+    out.append(1 if value else 0)
+
+
+def _decode_bool(data: bytes, pos: int, strings: List[str]) -> Tuple[bool, int]:
+    return data[pos] == 1, pos + 1
+
+
+def _encode_float(value: float, out: bytearray, strings: Dict[str, int]) -> None:
+    out += _DOUBLE.pack(value)
+
+
+def _decode_float(data: bytes, pos: int, strings: List[str]) -> Tuple[float, int]:
+    return _DOUBLE.unpack_from(data, pos)[0], pos + _DOUBLE.size
+
+
+def _encode_str(value: str, out: bytearray, strings: Dict[str, int]) -> None:
+    # Strings are interned per payload: player ids are written once and referenced after that
+    index = strings.get(value)
+    if index is not None:
+        _write_uint(out, index + 1)
+        return
+    strings[value] = len(strings)
+    encoded = value.encode()
+    out.append(0)
+    _write_uint(out, len(encoded))
+    out += encoded
+
+
+def _decode_str(data: bytes, pos: int, strings: List[str]) -> Tuple[str, int]:
+    ref, pos = _read_uint(data, pos)
+    if ref:
+        return strings[ref - 1], pos
+    length, pos = _read_uint(data, pos)
+    value = data[pos:pos + length].decode()
+    strings.append(value)
+    return value, pos + length
+
+
+_SCALARS: Dict[Any, Tuple[Encoder, Decoder]] = {
+    int: (_encode_int, _decode_int),
+    bool: (_encode_bool, _decode_bool),
+    float: (_encode_float, _decode_float),
+    str: (_encode_str, _decode_str),
+}
+
+_codecs: Dict[Any, Tuple[Encoder, Decoder]] = {}
+
+
+def _codec(tp: Any) -> Tuple[Encoder, Decoder]:
+    """Encoder and decoder for a type annotation, built once per type"""
+    if tp in _SCALARS:
+        return _SCALARS[tp]
+    if tp in _codecs:
+        return _codecs[tp]
+
+    origin = typing.get_origin(tp)
+    args = typing.get_args(tp)
+    if origin is typing.Union and len(args) == 2 and type(None) in args:
+        codec = _optional_codec(args[0] if args[1] is type(None) else args[1])
+    elif origin in (list, List):
+        codec = _list_codec(args[0])
+    elif origin in (dict, Dict):
+        codec = _dict_codec(args[0], args[1])
+    elif dataclasses.is_dataclass(tp):
+        codec = _dataclass_codec(tp)
+    else:
+        raise TypeError(f"No compact encoding for {tp}")
+    _codecs[tp] = codec
+    return codec
+
+
+def _optional_codec(tp: Any) -> Tuple[Encoder, Decoder]:
+    encode_item, decode_item = _codec(tp)
+
+    def encode(value, out, strings):
+        if value is None:
+            out.append(0)
+        else:
+            out.append(1)
+            encode_item(value, out, strings)
+
+    def decode(data, pos, strings):
+        if not data[pos]:
+            return None, pos + 1
+        return decode_item(data, pos + 1, strings)
+
+    return encode, decode
+
+
+def _list_codec(tp: Any) -> Tuple[Encoder, Decoder]:
+    encode_item, decode_item = _codec(tp)
+
+    def encode(value, out, strings):
+        _write_uint(out, len(value))
+        for item in value:
+            encode_item(item, out, strings)
+
+    def decode(data, pos, strings):
+        count, pos = _read_uint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = decode_item(data, pos, strings)
+            items.append(item)
+        return items, pos
+
+    return encode, decode
+
+
+def _dict_codec(key_tp: Any, value_tp: Any) -> Tuple[Encoder, Decoder]:
+    encode_key, decode_key = _codec(key_tp)
+    encode_value, decode_value = _codec(value_tp)
+
+    def encode(value, out, strings):
+        _write_uint(out, len(value))
+        for k, v in value.items():
+            encode_key(k, out, strings)
+            encode_value(v, out, strings)
+
+    def decode(data, pos, strings):
+        count, pos = _read_uint(data, pos)
+        result = {}
+        for _ in range(count):
+            k, pos = decode_key(data, pos, strings)
+            result[k], pos = decode_value(data, pos, strings)
+        return result, pos
+
+    return encode, decode
+
+
+def _dataclass_codec(cls: Type) -> Tuple[Encoder, Decoder]:
+    hints = typing.get_type_hints(cls)
+    names = [f.name for f in dataclasses.fields(cls)]
+    # Filled in below, nested dataclasses may refer back to this one
+    field_codecs: List[Tuple[str, Encoder, Decoder]] = []
+
+    def encode(value, out, strings):
+        _write_uint(out, len(field_codecs))
+        for name, encode_field, _ in field_codecs:
+            encode_field(getattr(value, name), out, strings)
+
+    def decode(data, pos, strings):
+        count, pos = _read_uint(data, pos)
+        if count > len(field_codecs):
+            raise ValueError(f"{cls.__name__} payload has {count} fields, this version knows {len(field_codecs)}")
+        kwargs = {}
+        for name, _, decode_field in field_codecs[:count]:
+            kwargs[name], pos = decode_field(data, pos, strings)
+        return cls(**kwargs), pos
+
+    _codecs[cls] = (encode, decode)
+    field_codecs.extend((name, *_codec(hints[name])) for name in names)
+    return encode, decode
+
+
+_TAGS = {cls: tag for tag, cls in enumerate(GAME_TYPES)}
+
+
+def encode_game_value(value: Any) -> bytes:
+    """Compact encoding of one of the GAME_TYPES"""
+    out = bytearray((FORMAT_VERSION, _TAGS[type(value)]))
+    _codec(type(value))[0](value, out, {})
+    return bytes(out)
+
+
+def decode_game_value(data: bytes) -> Any:
+    if data[0] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact payload version {data[0]}")
+    value, _ = _codec(GAME_TYPES[data[1]])[1](data, 2, [])
+    return value
+
+
+class CompactGamePayloadConverter(EncodingPayloadConverter):
+    """
+    Encodes the game dataclasses as varints and interned strings instead of
+    JSON objects. Payloads of other types are left to the next converter.
+    """
+
+    # Decode-only instances let every process understand compact payloads
+    # before any of them starts writing them.
+    write_compact = True
+
+    @property
+    def encoding(self) -> str:
+        return COMPACT_ENCODING
+
+    def to_payload(self, value: Any) -> Optional[Payload]:
+        if not self.write_compact or type(value) not in _TAGS:
+            return None
+        return Payload(
+            metadata={"encoding": COMPACT_ENCODING.encode()},
+            data=encode_game_value(value),
+        )
+
+    def from_payload(self, payload: Payload, type_hint: Optional[Type] = None) -> Any:
+        return decode_game_value(payload.data)
+
+
+class DecodeOnlyGamePayloadConverter(CompactGamePayloadConverter):
+    write_compact = False
+
+
+class GridBoardTypeConverter(JSONTypeConverter):
+    """
+    Reads boards in the JSON shape written before Board held two bitmasks,
+    {"grid": [[...]]}, e.g. activity inputs scheduled by rooms started
+    before the change. Those boards were always 3x3, three in a row.
+    """
+
+    def to_typed_value(self, hint: Type, value: Any) -> Any:
+        if hint is Board and isinstance(value, dict) and "grid" in value:
+            return Board.from_grid(value["grid"])
+        return JSONTypeConverter.Unhandled
+
+
+def _json_encoding_converters() -> List[EncodingPayloadConverter]:
+    """The default converters, with a JSON converter that also reads grid boards"""
+    return [
+        JSONPlainPayloadConverter(custom_type_converters=[GridBoardTypeConverter()])
+        if isinstance(converter, JSONPlainPayloadConverter) else converter
+        for converter in DefaultPayloadConverter.default_encoding_payload_converters
+    ]
+
+
+class GamePayloadConverter(CompositePayloadConverter):
+    """Default converters, with the compact game encoding tried first"""
+
+    def __init__(self) -> None:
+        super().__init__(CompactGamePayloadConverter(), *_json_encoding_converters())
+
+
+class JsonGamePayloadConverter(CompositePayloadConverter):
+    """Writes JSON like the default converter, but also reads compact game payloads"""
+
+    def __init__(self) -> None:
+        super().__init__(DecodeOnlyGamePayloadConverter(), *_json_encoding_converters())
+
+
+def game_data_converter(encoding: Optional[str] = None) -> DataConverter:
+    """
+    Data converter for clients, workers and replayers. GAME_PAYLOAD_ENCODING
+    selects what is written: "compact" (default) or "json". Both read either,
+    so a deployment can switch every process to "json" first and then to
+    "compact" without any process seeing payloads it cannot decode.
+    """
+    encoding = encoding or os.environ.get("GAME_PAYLOAD_ENCODING", "compact")
+    if encoding not in ("compact", "json"):
+        raise ValueError(f"Unsupported GAME_PAYLOAD_ENCODING: {encoding}")
+    converter_class = GamePayloadConverter if encoding == "compact" else JsonGamePayloadConverter
+    return dataclasses.replace(DataConverter.default, payload_converter_class=converter_class)
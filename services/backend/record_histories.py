@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import logging
+import re
+from pathlib import Path
+
+from temporalio.client import Client, WithStartWorkflowOperation
+from temporalio.common import WorkflowIDConflictPolicy
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Worker
+
+from activities import archive_game, check_game_state, validate_move
+from models import CreateRoomInput, JoinRoomInput, MatchmakerInput, MatchmakingInput, MoveInput
+from payload_converter import game_data_converter
+from workflows import MATCHMAKER_WORKFLOW_ID, GameRoomWorkflow, MatchmakerWorkflow
+
+
+TASK_QUEUE = "tic-tac-toe-task-queue"
+HISTORIES = Path(__file__).parent / "histories"
+
+
+async def play_room(client: Client, room_id: str, moves, **settings) -> str:
+    """Create a room, let bob join and play moves in turn, alice first. Returns the workflow ID."""
+    handle = await client.start_workflow(
+        GameRoomWorkflow.run,
+        CreateRoomInput(creator_id="alice", room_id=room_id, lobby_ttl_ms=600000, **settings),
+        id=f"tic-tac-toe-{room_id}",
+        task_queue=TASK_QUEUE,
+    )
+    if not settings.get("vs_bot"):
+        await handle.execute_update(GameRoomWorkflow.join, JoinRoomInput(room_id=room_id, player_id="bob"))
+    for i, (x, y) in enumerate(moves):
+        state = await handle.query(GameRoomWorkflow.get_state)
+        while state.game_status == "active" and state.current_turn != "alice" and settings.get("vs_bot"):
+            await asyncio.sleep(0.1)
+            state = await handle.query(GameRoomWorkflow.get_state)
+        if state.game_status != "active":
+            break
+        player_id = state.current_turn
+        await handle.execute_update(
+            GameRoomWorkflow.move, MoveInput(room_id=room_id, player_id=player_id, x=x, y=y, move_id=f"m{i}"),
+        )
+    await handle.result()
+    return handle.id
+
+
+async def inline_rules_win(client: Client) -> str:
+    return await play_room(client, "a1b2c3d4", [(0, 0), (1, 0), (1, 1), (2, 0), (2, 2)])
+
+
+async def inline_rules_timeout(client: Client) -> str:
+    # Nobody plays the third move, so alice loses on the turn timer
+    return await play_room(client, "e5f6a7b8", [(1, 1), (0, 0)])
+
+
+async def lobby_expired(client: Client) -> str:
+    handle = await client.start_workflow(
+        GameRoomWorkflow.run,
+        CreateRoomInput(creator_id="erin", room_id="c9d0e1f2", lobby_ttl_ms=2000),
+        id="tic-tac-toe-c9d0e1f2",
+        task_queue=TASK_QUEUE,
+    )
+    await handle.result()
+    return handle.id
+
+
+async def bot_clock_timeout(client: Client) -> str:
+    # No bot worker runs, so the bot's searches time out: the first on its move budget, which
+    # plays a fallback move, the second on what is left of its bank, which loses on time
+    return await play_room(
+        client, "b07c10c4", [(1, 1), (2, 0), (0, 2)], vs_bot=True, clock_ms=1500, bot_move_budget_ms=1000,
+    )
+
+
+async def matchmaker_quick_enqueue(client: Client) -> str:
+    async def enqueue(player_id: str):
+        return await client.execute_update_with_start_workflow(
+            MatchmakerWorkflow.enqueue,
+            MatchmakingInput(player_id=player_id),
+            start_workflow_operation=WithStartWorkflowOperation(
+                MatchmakerWorkflow.run,
+                MatchmakerInput(),
+                id=MATCHMAKER_WORKFLOW_ID,
+                task_queue=TASK_QUEUE,
+                id_conflict_policy=WorkflowIDConflictPolicy.USE_EXISTING,
+            ),
+        )
+
+    await enqueue("alice")
+    await enqueue("bob")
+    handle = client.get_workflow_handle(MATCHMAKER_WORKFLOW_ID)
+    while (await handle.query(MatchmakerWorkflow.assignment, "alice")).status != "matched":
+        await asyncio.sleep(0.1)
+    # alice picks her room up through the poll, bob asks again through enqueue
+    await handle.signal(MatchmakerWorkflow.leave, "alice")
+    await enqueue("bob")
+    return handle.id
+
+
+SCENARIOS = {
+    "inline-rules-win": inline_rules_win,
+    "inline-rules-timeout": inline_rules_timeout,
+    "lobby-expired": lobby_expired,
+    "bot-clock-timeout": bot_clock_timeout,
+    "matchmaker-quick-enqueue": matchmaker_quick_enqueue,
+}
+
+
+async def record(name: str, client: Client) -> None:
+    workflow_id = await SCENARIOS[name](client)
+    history = await client.get_workflow_handle(workflow_id).fetch_history()
+    # Worker identities name the host the history was recorded on
+    text = re.sub(r'"identity": "[^"]*"', '"identity": "worker@host"', history.to_json())
+    (HISTORIES / f"{name}.json").write_text(text + "\n")
+    # A recorded history replaces the hand-built one of the same scenario
+    (HISTORIES / f"synthetic-{name}.json").unlink(missing_ok=True)
+    logging.info(f"Recorded {name} ({len(history.events)} events)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Record room and matchmaker histories from real runs on a local dev server into histories/"
+    )
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to record, all if omitted: {', '.join(SCENARIOS)}")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    logging.basicConfig(level=logging.INFO)
+
+    async with await WorkflowEnvironment.start_local(data_converter=game_data_converter()) as env:
+        async with Worker(
+            env.client,
+            task_queue=TASK_QUEUE,
+            workflows=[GameRoomWorkflow, MatchmakerWorkflow],
+            activities=[validate_move, check_game_state, archive_game],
+        ):
+            await asyncio.gather(*(record(name, env.client) for name in args.scenarios or SCENARIOS))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
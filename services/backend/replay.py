@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+from temporalio.client import Client, WorkflowHistory
+from temporalio.worker import Replayer
+
+from payload_converter import game_data_converter
+from workflows import GameRoomWorkflow, MatchmakerWorkflow
+
+
+async def load_file_histories(paths):
+    """Load histories exported with `temporal workflow show --output json`"""
+    for path in paths:
+        path = Path(path)
+        files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+        for file in files:
+            yield WorkflowHistory.from_json(file.stem, file.read_text())
+
+
+async def replay(histories) -> int:
+    replayer = Replayer(workflows=[GameRoomWorkflow, MatchmakerWorkflow], data_converter=game_data_converter())
+    failed = 0
+    total = 0
+    async for history in histories:
+        total += 1
+        result = await replayer.replay_workflow(history, raise_on_replay_failure=False)
+        if result.replay_failure:
+            failed += 1
+            logging.error(f"Replay failed for {history.workflow_id}: {result.replay_failure}")
+    logging.info(f"Replayed {total} histories, {failed} failed")
+    return failed
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Replay recorded GameRoomWorkflow and MatchmakerWorkflow histories against the current workflow code "
+        "to catch non-deterministic changes."
+    )
+    parser.add_argument("paths", nargs="*", help="History JSON files or directories. Fetches from the server if omitted.")
+    parser.add_argument("--address", default="localhost:7233")
+    parser.add_argument("--query", default="WorkflowType IN ('GameRoomWorkflow', 'MatchmakerWorkflow')")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.paths:
+        histories = load_file_histories(args.paths)
+    else:
+        client = await Client.connect(args.address, data_converter=game_data_converter())
+        histories = client.list_workflows(args.query).map_histories()
+
+    failed = await replay(histories)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional, Set
+
+from temporalio.converter import AdvancedJSONEncoder
+
+
+logger = logging.getLogger(__name__)
+
+RoomEventHandler = Callable[[str, dict], Awaitable[None]]
+
+DEFAULT_SOCKET_PATH = "/tmp/tic-tac-toe-bus.sock"
+
+
+class RoomEventBus(ABC):
+    """
+    Delivers room events to every server process.
+
+    Each process publishes the room events it produces and receives all
+    events, including its own, through the handler passed to start. This is
+    what lets a broadcast reach sockets held by any uvicorn worker.
+    """
+
+    @abstractmethod
+    async def start(self, handler: RoomEventHandler) -> None:
+        ...
+
+    @abstractmethod
+    async def publish(self, room_id: str, event: dict) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryRoomEventBus(RoomEventBus):
+    """Single process bus, events go straight to the local handler without serialization"""
+
+    def __init__(self) -> None:
+        self._handler: Optional[RoomEventHandler] = None
+
+    async def start(self, handler: RoomEventHandler) -> None:
+        self._handler = handler
+
+    async def publish(self, room_id: str, event: dict) -> None:
+        await self._handler(room_id, event)
+
+
+class UnixSocketRoomEventBus(RoomEventBus):
+    """
+    Multi-process bus that relays newline-delimited JSON events through a
+    RoomEventBroker listening on a Unix socket. Reconnects when the broker
+    goes away; while disconnected, events still reach this process's own
+    clients.
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET_PATH, reconnect_delay: float = 1.0) -> None:
+        self.path = path
+        self.reconnect_delay = reconnect_delay
+        self._handler: Optional[RoomEventHandler] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: RoomEventHandler) -> None:
+        self._handler = handler
+        self._task = asyncio.create_task(self._run())
+
+    async def publish(self, room_id: str, event: dict) -> None:
+        if self._writer is None:
+            # Broker unreachable, at least reach this process's own clients
+            await self._handler(room_id, event)
+            return
+        line = json.dumps({"room_id": room_id, "event": event}, cls=AdvancedJSONEncoder)
+        self._writer.write(line.encode() + b"\n")
+        await self._writer.drain()
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                logger.warning(f"Room event broker at {self.path} unavailable: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            self._writer = writer
+            logger.info(f"Connected to room event broker at {self.path}")
+            try:
+                while line := await reader.readline():
+                    message = json.loads(line)
+                    try:
+                        await self._handler(message["room_id"], message["event"])
+                    except Exception:
+                        logger.exception(f"Room event handler failed for room {message['room_id']}")
+            except ConnectionError as e:
+                logger.warning(f"Lost room event broker connection: {e}")
+            finally:
+                self._writer = None
+                writer.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+
+class RoomEventBroker:
+    """
+    Relays every event line it receives to all connected server processes.
+    Subscribers whose unsent buffer grows past max_buffer are disconnected,
+    they reconnect and clients resync from the state cache / change feed.
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET_PATH, max_buffer: int = 4 * 1024 * 1024) -> None:
+        self.path = path
+        self.max_buffer = max_buffer
+        self._subscribers: Set[asyncio.StreamWriter] = set()
+
+    async def serve_forever(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._handle, path=self.path)
+        logger.info(f"Room event broker listening on {self.path}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._subscribers.add(writer)
+        try:
+            while line := await reader.readline():
+                for subscriber in list(self._subscribers):
+                    if subscriber.transport.get_write_buffer_size() > self.max_buffer:
+                        logger.warning("Dropping slow room event subscriber")
+                        self._subscribers.discard(subscriber)
+                        subscriber.close()
+                        continue
+                    subscriber.write(line)
+        except ConnectionError:
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            writer.close()
+
+
+def create_room_bus(url: str) -> RoomEventBus:
+    """Build a bus from a URL: memory:// (default, single process) or unix:///path/to/socket"""
+    if url.startswith("unix://"):
+        return UnixSocketRoomEventBus(url[len("unix://"):] or DEFAULT_SOCKET_PATH)
+    if url in ("", "memory://"):
+        return InMemoryRoomEventBus()
+    raise ValueError(f"Unsupported room bus URL: {url}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Room event broker for running several server processes")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(RoomEventBroker(args.socket).serve_forever())
@@ -0,0 +1,125 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from models import GameState
+
+
+ROOM_STATUSES = ("waiting", "active", "finished", "expired")
+
+# Statuses of closed rooms, dropped from the index after finished_ttl
+CLOSED_STATUSES = ("finished", "expired")
+
+
+@dataclass
+class RoomSummary:
+    room_id: str
+    status: str
+    players: List[str]
+    board_size: int
+    win_length: int
+    best_of: int
+    game_number: int
+    version: int
+    move_deadline_ms: Optional[int]
+    lobby_deadline_ms: Optional[int]
+    updated_at: float  # wall clock time the summary was last refreshed
+
+
+class RoomIndex:
+    """
+    Summaries of the rooms this server has seen, grouped by status, so room
+    listings never query Temporal. Kept up to date from the room states
+    every server publishes on the room bus (creates, joins, moves, finishes)
+    and from states read from the workflows.
+
+    An active room whose move deadline has passed with no newer state has
+    timed out, and is listed as finished. Likewise a waiting room past its
+    lobby deadline was closed by its workflow, and is listed as expired.
+    Closed rooms are dropped after finished_ttl seconds.
+    """
+
+    def __init__(self, finished_ttl: float = 300.0, clock: Callable[[], float] = time.time) -> None:
+        self.finished_ttl = finished_ttl
+        self._clock = clock
+        self._rooms: Dict[str, RoomSummary] = {}
+        # Insertion ordered, oldest first, so listings and expiry need no sorting
+        self._by_status: Dict[str, Dict[str, None]] = {status: {} for status in ROOM_STATUSES}
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    def update(self, room_id: str, state: GameState) -> bool:
+        """Record a room's state unless a newer one is known. Returns whether it was recorded."""
+        current = self._rooms.get(room_id)
+        if current is not None and current.version > state.version:
+            return False
+        status = state.game_status if state.game_status in ROOM_STATUSES else "active"
+        summary = RoomSummary(
+            room_id=room_id,
+            status=status,
+            players=list(state.players),
+            board_size=state.board.size,
+            win_length=state.board.win_length,
+            best_of=state.best_of,
+            game_number=state.game_number,
+            version=state.version,
+            move_deadline_ms=state.move_deadline_ms,
+            lobby_deadline_ms=state.lobby_deadline_ms,
+            updated_at=self._clock(),
+        )
+        self._move(room_id, current.status if current else None, status)
+        self._rooms[room_id] = summary
+        return True
+
+    def rooms(self, status: Optional[str] = None, limit: int = 100) -> List[RoomSummary]:
+        """Rooms by status, most recently updated first within each, optionally only one status"""
+        self._expire()
+        statuses = [status] if status else ROOM_STATUSES
+        result = []
+        for room_status in statuses:
+            for room_id in reversed(self._by_status[room_status]):
+                if len(result) >= limit:
+                    return result
+                result.append(self._rooms[room_id])
+        return result
+
+    def counts(self) -> Dict[str, int]:
+        self._expire()
+        return {status: len(room_ids) for status, room_ids in self._by_status.items()}
+
+    def _move(self, room_id: str, old_status: Optional[str], new_status: str) -> None:
+        if old_status is not None:
+            del self._by_status[old_status][room_id]
+        self._by_status[new_status][room_id] = None
+
+    def _expire(self) -> None:
+        now = self._clock()
+        now_ms = now * 1000
+        timed_out = [
+            room_id for room_id in self._by_status["active"]
+            if (self._rooms[room_id].move_deadline_ms or now_ms) < now_ms
+        ]
+        for room_id in timed_out:
+            self._close(room_id, "active", "finished", now)
+        expired = [
+            room_id for room_id in self._by_status["waiting"]
+            if (self._rooms[room_id].lobby_deadline_ms or now_ms) < now_ms
+        ]
+        for room_id in expired:
+            self._close(room_id, "waiting", "expired", now)
+
+        for status in CLOSED_STATUSES:
+            closed = self._by_status[status]
+            while closed:
+                room_id = next(iter(closed))
+                if now - self._rooms[room_id].updated_at < self.finished_ttl:
+                    break
+                del closed[room_id]
+                del self._rooms[room_id]
+
+    def _close(self, room_id: str, old_status: str, new_status: str, now: float) -> None:
+        summary = self._rooms[room_id]
+        summary.status = new_status
+        summary.updated_at = now
+        self._move(room_id, old_status, new_status)
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+import orjson
+from fastapi.responses import Response
+
+from models import GameState
+
+# Optional: without msgpack the WebSocket endpoint only speaks JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# WebSocket subprotocol for MessagePack frames (binary) instead of JSON (text)
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+Payload = Union[str, bytes]  # str is sent as a text frame, bytes as a binary frame
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def state_dict(state: GameState) -> Dict:
+    """The room state as clients see it, the one place its wire shape is defined"""
+    return {
+        "board": state.board.grid,
+        "players": state.players,
+        "current_turn": state.current_turn,
+        "game_status": state.game_status,
+        "winner": state.winner,
+        "move_deadline": state.move_deadline,
+        "move_deadline_ms": state.move_deadline_ms,
+        "clocks_ms": state.clocks_ms,
+        "version": state.version,
+        "best_of": state.best_of,
+        "game_number": state.game_number,
+        "scores": state.scores,
+        "rematch_requests": state.rematch_requests,
+        "lobby_deadline_ms": state.lobby_deadline_ms,
+    }
+
+
+class EncodedStateCache:
+    """
+    Encoded room states, by room, version and format. A version of a room
+    never changes, so each one is built and encoded once, however many
+    responses and broadcasts carry it.
+    """
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, bool], bytes]" = OrderedDict()
+
+    def get(self, room_id: str, state: GameState, binary: bool = False) -> bytes:
+        key = (room_id, state.version, binary)
+        encoded = self._entries.get(key)
+        if encoded is not None:
+            self._entries.move_to_end(key)
+            return encoded
+        encoded = msgpack.packb(state_dict(state)) if binary else orjson.dumps(state_dict(state))
+        self._entries[key] = encoded
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return encoded
+
+
+encoded_states = EncodedStateCache()
+
+
+def dumps(message: Any, binary: bool = False) -> bytes:
+    return msgpack.packb(message) if binary else orjson.dumps(message)
+
+
+def loads(data: Payload, binary: bool = False) -> Any:
+    return msgpack.unpackb(data) if binary else orjson.loads(data)
+
+
+def encode_with_state(message: Dict, room_id: str, state: GameState, binary: bool = False) -> bytes:
+    """message plus a "state" field, spliced in from the encoded state cache instead of re-encoding it"""
+    body = dumps(message, binary)
+    encoded_state = encoded_states.get(room_id, state, binary)
+    if binary:
+        # Bump the entry count in the fixmap header, then append the extra key and value
+        if not 0x80 <= body[0] < 0x8F:
+            raise ValueError("Messages carrying a state must have fewer than 15 other fields")
+        return bytes((body[0] + 1,)) + body[1:] + msgpack.packb("state") + encoded_state
+    if body == b"{}":
+        return b'{"state":' + encoded_state + b"}"
+    return body[:-1] + b',"state":' + encoded_state + b"}"
+
+
+class OutgoingMessage:
+    """A WebSocket message, encoded at most once per wire format however many connections get it"""
+
+    def __init__(self, message: Dict, room_id: Optional[str] = None, state: Optional[GameState] = None) -> None:
+        self.message = message
+        self.room_id = room_id
+        self.state = state
+        self._encoded: Dict[bool, Payload] = {}
+
+    def encoded(self, binary: bool = False) -> Payload:
+        payload = self._encoded.get(binary)
+        if payload is None:
+            if self.state is not None:
+                payload = encode_with_state(self.message, self.room_id, self.state, binary)
+            else:
+                payload = dumps(self.message, binary)
+            if not binary:
+                payload = payload.decode()  # JSON goes out as text frames
+            self._encoded[binary] = payload
+        return payload
+
+
+class JSONBytesResponse(Response):
+    """JSON response rendered with orjson, or sent as is when the body is already encoded"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content)
+
+
+def state_response(fields: Dict, room_id: str, state: GameState) -> JSONBytesResponse:
+    """REST response with the given fields and the room state, from the encoded state cache"""
+    return JSONBytesResponse(encode_with_state(fields, room_id, state))
@@ -1,21 +1,73 @@
 import asyncio
-import json
+import contextlib
+import dataclasses
+import math
+import os
+import time
 import uuid
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional, Tuple
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 
-from temporalio.client import Client
+from temporalio.client import Client, WithStartWorkflowOperation, WorkflowUpdateFailedError
+from temporalio.common import WorkflowIDConflictPolicy
+from temporalio.converter import value_to_type
 from temporalio.exceptions import ApplicationError
+from temporalio.service import RPCError, RPCStatusCode
 
-from activities import Board
-from workflows import CreateRoomInput, GameRoomWorkflow, JoinRoomInput, MoveInput
+from admission import AdmissionError, ConcurrencyLimiter, RateLimiter
+from archive import archive_path, export_records
+from change_feed import ChangeFeed
+from fanout import HEARTBEAT_TIMEOUT_CLOSE_CODE, ConnectionSender, broadcast
+from room_bus import create_room_bus
+from room_index import ROOM_STATUSES, RoomIndex
+from serialization import (
+    MSGPACK_SUBPROTOCOL,
+    JSONBytesResponse,
+    OutgoingMessage,
+    dumps,
+    encoded_states,
+    loads,
+    msgpack_available,
+    state_response,
+)
+from sharding import ShardMap
+from state_delta import delta_message
+from state_cache import GameStateCache
+from models import (
+    CreateRoomInput,
+    GameState,
+    JoinRoomInput,
+    MatchAssignment,
+    MatchmakerInput,
+    MatchmakingInput,
+    MoveInput,
+)
+from payload_converter import game_data_converter
+from telemetry import (
+    BROADCAST_FANOUT_LATENCY,
+    MOVES_REJECTED,
+    REQUESTS_REJECTED,
+    ROOMS,
+    ROOMS_RELEASED,
+    STATE_VISIBLE_LATENCY,
+    TEMPORAL_RPCS_IN_FLIGHT,
+    WEBSOCKET_CONNECTIONS,
+    WEBSOCKETS_PRUNED,
+    MetricsMiddleware,
+    metrics_available,
+    metrics_payload,
+    temporal_interceptors,
+    temporal_runtime,
+)
+from workflows import DUPLICATE_MOVE_ERROR, MATCHMAKER_WORKFLOW_ID, GameRoomWorkflow, MatchmakerWorkflow
 
 
-app = FastAPI(title="Tic-Tac-Toe Game Server")
+app = FastAPI(title="Tic-Tac-Toe Game Server", default_response_class=JSONBytesResponse)
 
 # Allow CORS for the frontend
 app.add_middleware(
@@ -26,15 +78,111 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store active connections by room_id
-active_connections: Dict[str, Set[WebSocket]] = {}
+# Latency per endpoint, plus a span per request that traces follow into the workflows
+app.add_middleware(MetricsMiddleware)
+
+# Store active connections by room_id, each with its own outbound queue
+active_connections: Dict[str, Dict[WebSocket, ConnectionSender]] = {}
 
 # Temporal client - will be initialized on startup
 temporal_client = None
 
+# Latest known state per room, refreshed from update results so repeated reads skip Temporal
+state_cache = GameStateCache()
+
+# Summaries of every room this server has seen a state of, for room listings
+room_index = RoomIndex()
+
+# Follows workflow state transitions for rooms with connected clients - initialized on startup
+change_feed: Optional[ChangeFeed] = None
+
+# Last state broadcast per room, so each transition is sent exactly once and deltas have a base
+broadcast_states: Dict[str, GameState] = {}
+
+# Tasks running for as long as the server, cancelled on shutdown
+background_tasks: List[asyncio.Task] = []
+
+# Carries room states to every server process, so broadcasts reach sockets held by any worker.
+# memory:// for a single process, unix:///path/to/socket (see room_bus.py) for several.
+room_bus = create_room_bus(os.environ.get("ROOM_BUS_URL", "memory://"))
+
+# Task queue of each new room, from ROOM_SHARDS and TASK_QUEUE - workers must use the same values
+shard_map = ShardMap.from_env()
+
+# Token buckets per player (or client address, for requests without a player ID) and per
+# room, so one client cannot flood Temporal or a single room's workflow. 0 disables a limit.
+player_limiter = RateLimiter(
+    "player",
+    rate=float(os.environ.get("PLAYER_RATE_LIMIT", "5")),
+    burst=float(os.environ.get("PLAYER_RATE_BURST", "20")),
+)
+room_limiter = RateLimiter(
+    "room",
+    rate=float(os.environ.get("ROOM_RATE_LIMIT", "20")),
+    burst=float(os.environ.get("ROOM_RATE_BURST", "40")),
+)
+# Per client address: room creation and matchmaking, which a client could otherwise spread
+# over made-up player IDs, and, on a larger budget, anonymous reads that have to query Temporal
+address_limiter = RateLimiter(
+    "address",
+    rate=float(os.environ.get("ADDRESS_RATE_LIMIT", "5")),
+    burst=float(os.environ.get("ADDRESS_RATE_BURST", "20")),
+)
+read_limiter = RateLimiter(
+    "read",
+    rate=float(os.environ.get("READ_RATE_LIMIT", "50")),
+    burst=float(os.environ.get("READ_RATE_BURST", "200")),
+)
+
+# Caps the Temporal RPCs request handlers have in flight, shedding the excess. The change
+# feed long-poll is not counted, it would hold a slot for seconds.
+temporal_rpcs = ConcurrencyLimiter(
+    max_in_flight=int(os.environ.get("MAX_TEMPORAL_RPCS", "64")),
+    max_waiting=int(os.environ.get("MAX_TEMPORAL_RPCS_WAITING", "256")),
+    max_wait=float(os.environ.get("TEMPORAL_RPC_MAX_WAIT_SECONDS", "2")),
+)
+
+
+MIN_BOARD_SIZE = 3
+MAX_BOARD_SIZE = 19
+MAX_BEST_OF = 9
+MIN_BOT_MOVE_BUDGET_MS = 50
+MAX_BOT_MOVE_BUDGET_MS = 10000
+MAX_CLOCK_MS = 60 * 60 * 1000
+MAX_INCREMENT_MS = 60 * 1000
+MAX_BATCH_ROOMS = 1000
+# Workflow queries in flight at once for a batch of room states
+STATE_BATCH_CONCURRENCY = 32
+# Running rooms whose state is read into the room index on startup
+MAX_INDEXED_ON_STARTUP = 10000
+# Rooms nobody joins within this many seconds are closed by their workflow, 0 to keep them open
+LOBBY_TTL_SECONDS = int(os.environ.get("LOBBY_TTL_SECONDS", "600"))
+# Every connection gets a ping this often, and is closed once it has sent nothing, pongs included,
+# for HEARTBEAT_TIMEOUT_SECONDS
+HEARTBEAT_INTERVAL_SECONDS = float(os.environ.get("HEARTBEAT_INTERVAL_SECONDS", "15"))
+HEARTBEAT_TIMEOUT_SECONDS = float(os.environ.get("HEARTBEAT_TIMEOUT_SECONDS", "45"))
+
 
 class CreateRoomRequest(BaseModel):
     player_id: Optional[str] = None
+    board_size: int = Field(default=3, ge=MIN_BOARD_SIZE, le=MAX_BOARD_SIZE)
+    win_length: Optional[int] = None  # defaults to min(board_size, 5)
+    best_of: int = Field(default=1, ge=1, le=MAX_BEST_OF)  # games in the match, must be odd
+    vs_bot: bool = False  # play against the bot, the game starts right away
+    bot_move_budget_ms: int = Field(default=1000, ge=MIN_BOT_MOVE_BUDGET_MS, le=MAX_BOT_MOVE_BUDGET_MS)
+    clock_ms: int = Field(default=0, ge=0, le=MAX_CLOCK_MS)  # chess clock bank per player, 0 for 30s per move
+    increment_ms: int = Field(default=0, ge=0, le=MAX_INCREMENT_MS)  # added to the bank after each move
+
+
+class RematchRequest(BaseModel):
+    player_id: str
+
+
+class MatchmakingRequest(BaseModel):
+    player_id: Optional[str] = None
+    board_size: int = Field(default=3, ge=MIN_BOARD_SIZE, le=MAX_BOARD_SIZE)
+    win_length: Optional[int] = None  # defaults to min(board_size, 5)
+    best_of: int = Field(default=1, ge=1, le=MAX_BEST_OF)
 
 
 class JoinRoomRequest(BaseModel):
@@ -45,48 +193,342 @@ class MoveRequest(BaseModel):
     player_id: str
     x: int
     y: int
+    move_id: Optional[str] = Field(default=None, max_length=64)  # same for every retry of a move
+
+
+class RoomStateBatchRequest(BaseModel):
+    room_ids: List[str] = Field(max_length=MAX_BATCH_ROOMS)
 
 
 @app.on_event("startup")
 async def startup_event():
     global temporal_client
-    temporal_client = await Client.connect("localhost:7233")
+    global change_feed
+    # Already set when the app is embedded, e.g. by benchmark.py
+    if temporal_client is None:
+        temporal_client = await Client.connect(
+            "localhost:7233",
+            data_converter=game_data_converter(),
+            interceptors=temporal_interceptors(),
+            # The Temporal client's own metrics, on a separate port when set
+            runtime=temporal_runtime(os.environ.get("TEMPORAL_METRICS_ADDRESS")),
+        )
+    change_feed = ChangeFeed(temporal_client, publish_state)
+    await room_bus.start(on_room_event)
+    asyncio.create_task(index_running_rooms())
+    background_tasks.append(asyncio.create_task(run_sweeper()))
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    await change_feed.close()
+    await room_bus.close()
+
+
+async def run_sweeper():
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL_SECONDS)
+        try:
+            sweep_rooms()
+        except Exception as e:
+            print(f"Room sweep failed: {str(e)}")
+
+
+def sweep_rooms():
+    """
+    Close the sockets that missed their heartbeats and ping the others, then
+    release what this server still holds for rooms nobody is connected to,
+    and refresh the room gauges.
+    """
+    now = time.monotonic()
+    for room_id, connections in list(active_connections.items()):
+        for sender in list(connections.values()):
+            silent = now - sender.last_seen
+            if not sender.closed and silent > HEARTBEAT_TIMEOUT_SECONDS:
+                WEBSOCKETS_PRUNED.inc()
+                sender.evict(f"no heartbeat for {silent:.0f}s", HEARTBEAT_TIMEOUT_CLOSE_CODE)
+        broadcast(connections.values(), {"type": "ping"}, coalesce_key="ping")
+    
+    watched = {
+        room_id for room_id, connections in active_connections.items()
+        if any(not sender.closed for sender in connections.values())
+    }
+    zombies = (set(active_connections) | set(broadcast_states) | set(change_feed.following())) - watched
+    ROOMS.labels("zombie").set(len(zombies))
+    for room_id in zombies:
+        release_room(room_id)
+    ROOMS_RELEASED.inc(len(zombies))
+    
+    counts = room_index.counts()
+    ROOMS.labels("live").set(counts["active"])
+    ROOMS.labels("waiting").set(counts["waiting"])
+
+
+async def publish_state(room_id: str, state: GameState):
+    """Publish a new room state to every server process"""
+    await room_bus.publish(room_id, {"state": state})
+
+
+async def on_room_event(room_id: str, event: dict):
+    state = event["state"]
+    if not isinstance(state, GameState):
+        # Decoded from another process
+        state = value_to_type(GameState, state)
+    await deliver_state(room_id, state)
+
+
+async def deliver_state(room_id: str, state: GameState):
+    """Record a new room state and broadcast it once to this process's clients in the room"""
+    state_cache.put(room_id, state)
+    room_index.update(room_id, state)
+    previous = broadcast_states.get(room_id)
+    if room_id not in active_connections or (previous and state.version <= previous.version):
+        return
+    broadcast_states[room_id] = state
+    
+    started = time.perf_counter()
+    senders = active_connections[room_id].values()
+    full_senders = [sender for sender in senders if not sender.delta]
+    delta_senders = [sender for sender in senders if sender.delta]
+    if full_senders:
+        # Encoded once per version and format, shared with every REST response carrying it
+        broadcast(full_senders, OutgoingMessage({"type": "state_update"}, room_id, state), coalesce_key="state")
+    if delta_senders:
+        # Deltas are never coalesced, a client that misses one sees a gap and resyncs
+        broadcast(delta_senders, delta_message(previous, state))
+    BROADCAST_FANOUT_LATENCY.observe(time.perf_counter() - started)
+
+
+def follow_room(room_id: str):
+    """Follow the room's change feed while it has connected clients"""
+    if room_id in active_connections:
+        previous = broadcast_states.get(room_id)
+        change_feed.subscribe(room_id, previous.version if previous else -1)
+
+
+def client_address(client) -> str:
+    return f"addr:{client.host if client else 'unknown'}"
+
+
+def client_key(player_id: Optional[str], client) -> str:
+    """Rate limit key of a request: its player, or the client's address when it names none"""
+    if player_id:
+        return f"player:{player_id}"
+    return client_address(client)
+
+
+def admit(player_key: str, room_id: Optional[str] = None, address: Optional[str] = None):
+    """
+    Charge a request to its player's rate limit, and to its room's and its
+    client address's when given. Raises RateLimited once one is used up.
+    """
+    player_limiter.check(player_key)
+    if room_id is not None:
+        room_limiter.check(room_id)
+    if address is not None:
+        address_limiter.check(address)
+
+
+@contextlib.asynccontextmanager
+async def temporal_rpc():
+    """Wrap each Temporal RPC a request makes, raises Overloaded when too many are in flight"""
+    async with temporal_rpcs:
+        TEMPORAL_RPCS_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            TEMPORAL_RPCS_IN_FLIGHT.dec()
+
+
+def rejection_message(e: AdmissionError) -> dict:
+    """WebSocket error frame for a request refused by admission control"""
+    REQUESTS_REJECTED.labels(e.reason, "websocket").inc()
+    return {
+        "type": "error",
+        "code": e.code,
+        "message": str(e),
+        "retry_after": e.retry_after,
+    }
+
+
+@app.exception_handler(AdmissionError)
+async def admission_error_handler(request: Request, e: AdmissionError):
+    REQUESTS_REJECTED.labels(e.reason, "rest").inc()
+    return JSONBytesResponse(
+        {"detail": str(e), "code": e.code},
+        status_code=429,
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
+
+
+async def fetch_state(room_id: str) -> GameState:
+    """Get a room's state from the cache, querying the workflow only on a miss"""
+    state = state_cache.get(room_id)
+    if state is None:
+        handle = temporal_client.get_workflow_handle(f"tic-tac-toe-{room_id}")
+        async with temporal_rpc():
+            state = await handle.query(GameRoomWorkflow.get_state)
+        state_cache.put(room_id, state)
+        room_index.update(room_id, state)
+    return state
+
+
+async def fetch_states(room_ids: List[str]) -> Tuple[Dict[str, GameState], Dict[str, str]]:
+    """
+    States of many rooms, and the error for each room that could not be read.
+    Cache misses are queried concurrently, at most STATE_BATCH_CONCURRENCY at a time.
+    """
+    states: Dict[str, GameState] = {}
+    errors: Dict[str, str] = {}
+    misses = []
+    for room_id in dict.fromkeys(room_ids):
+        state = state_cache.get(room_id)
+        if state is None:
+            misses.append(room_id)
+        else:
+            states[room_id] = state
+    
+    semaphore = asyncio.Semaphore(STATE_BATCH_CONCURRENCY)
+    
+    async def fetch(room_id: str) -> GameState:
+        async with semaphore:
+            return await fetch_state(room_id)
+    
+    results = await asyncio.gather(*(fetch(room_id) for room_id in misses), return_exceptions=True)
+    for room_id, result in zip(misses, results):
+        if isinstance(result, Exception):
+            errors[room_id] = str(result)
+        else:
+            states[room_id] = result
+    return states, errors
+
+
+async def index_running_rooms():
+    """Read the rooms that were already running when this server started into the room index"""
+    try:
+        room_ids = []
+        query = "WorkflowType = 'GameRoomWorkflow' AND ExecutionStatus = 'Running'"
+        async for execution in temporal_client.list_workflows(query, limit=MAX_INDEXED_ON_STARTUP):
+            room_ids.append(execution.id.removeprefix("tic-tac-toe-"))
+        _, errors = await fetch_states(room_ids)
+        print(f"Indexed {len(room_ids) - len(errors)} running rooms")
+    except Exception as e:
+        # Listings then only show rooms seen since startup
+        print(f"Could not index running rooms: {str(e)}")
+
+
+def move_rejection(state: GameState, player_id: str, x: int, y: int) -> Optional[str]:
+    """Why a room's latest known state rules a move out, mirroring the workflow's move validator"""
+    if state.game_status == "finished":
+        # The room may already be playing its next game or a rematch in a new run, only the workflow knows
+        return None
+    if state.game_status != "active":
+        return f"Game is not active: {state.game_status}"
+    if player_id not in state.players:
+        return f"Unknown player: {player_id}"
+    if player_id != state.current_turn:
+        return "Not your turn"
+    if not state.board.is_valid_move(x, y):
+        return f"Invalid move: {x},{y}"
+    return None
+
+
+async def submit_move(room_id: str, player_id: str, x: int, y: int, move_id: Optional[str]) -> GameState:
+    """
+    Apply a move and publish the resulting state. Moves the cached state
+    already rules out are rejected here, and retries of an applied move_id
+    get the current state back, so neither costs a history event.
+    """
+    state = state_cache.get(room_id)
+    if state is not None:
+        if move_id is not None and move_id in state.recent_move_ids:
+            MOVES_REJECTED.labels("duplicate").inc()
+            return state
+        reason = move_rejection(state, player_id, x, y)
+        if reason is not None:
+            MOVES_REJECTED.labels("invalid").inc()
+            raise ValueError(reason)
+    
+    handle = temporal_client.get_workflow_handle(f"tic-tac-toe-{room_id}")
+    try:
+        # Temporal also dedupes updates by ID while a retry races the original
+        async with temporal_rpc():
+            state = await handle.execute_update(
+                GameRoomWorkflow.move,
+                MoveInput(room_id=room_id, player_id=player_id, x=x, y=y, move_id=move_id),
+                id=f"move-{move_id}" if move_id is not None else None,
+            )
+    except WorkflowUpdateFailedError as e:
+        if isinstance(e.cause, ApplicationError) and e.cause.type == DUPLICATE_MOVE_ERROR:
+            # Applied by an earlier attempt that this server has not seen the result of
+            state_cache.invalidate(room_id)
+            return await fetch_state(room_id)
+        raise
+    await publish_state(room_id, state)
+    return state
+
+
+def check_best_of(best_of: int) -> None:
+    if not (1 <= best_of <= MAX_BEST_OF and best_of % 2 == 1):
+        raise HTTPException(status_code=400, detail=f"best_of must be an odd number between 1 and {MAX_BEST_OF}")
+
+
+def resolve_win_length(board_size: int, win_length: Optional[int]) -> int:
+    """Default and validate the win length for a board of the given size"""
+    if win_length is None:
+        return min(board_size, 5)
+    if not MIN_BOARD_SIZE <= win_length <= board_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"win_length must be between {MIN_BOARD_SIZE} and board_size ({board_size})",
+        )
+    return win_length
 
 
 @app.post("/rooms")
-async def create_room(request: CreateRoomRequest):
+async def create_room(request: CreateRoomRequest, http_request: Request):
+    admit(client_key(request.player_id, http_request.client), address=client_address(http_request.client))
     player_id = request.player_id or str(uuid.uuid4())
+    win_length = resolve_win_length(request.board_size, request.win_length)
+    check_best_of(request.best_of)
     
     # Generate a short room ID
     room_id = str(uuid.uuid4())[:8]
     
     # Start a new game workflow
-    handle = await temporal_client.start_workflow(
-        GameRoomWorkflow.run,
-        CreateRoomInput(creator_id=player_id, room_id=room_id),
-        id=f"tic-tac-toe-{room_id}",
-        task_queue="tic-tac-toe-task-queue",
-    )
+    async with temporal_rpc():
+        handle = await temporal_client.start_workflow(
+            GameRoomWorkflow.run,
+            CreateRoomInput(
+                creator_id=player_id,
+                room_id=room_id,
+                board_size=request.board_size,
+                win_length=win_length,
+                best_of=request.best_of,
+                vs_bot=request.vs_bot,
+                bot_move_budget_ms=request.bot_move_budget_ms,
+                clock_ms=request.clock_ms,
+                increment_ms=request.increment_ms,
+                lobby_ttl_ms=LOBBY_TTL_SECONDS * 1000,
+            ),
+            id=f"tic-tac-toe-{room_id}",
+            task_queue=shard_map.room_queue(room_id),
+        )
     
-    # Query to get the room ID
-    state = await handle.query(GameRoomWorkflow.get_state)
+        # Query to get the room ID
+        state = await handle.query(GameRoomWorkflow.get_state)
+    state_cache.put(room_id, state)
+    # Published so every server lists the new room
+    await publish_state(room_id, state)
     
-    return {
-        "room_id": room_id,
-        "player_id": player_id,
-        "state": {
-            "board": [[cell for cell in row] for row in state.board.grid],
-            "players": state.players,
-            "current_turn": state.current_turn,
-            "game_status": state.game_status,
-            "winner": state.winner,
-            "move_deadline": state.move_deadline
-        }
-    }
+    return state_response({"room_id": room_id, "player_id": player_id}, room_id, state)
 
 
 @app.post("/rooms/{room_id}/join")
-async def join_room(room_id: str, request: JoinRoomRequest):
+async def join_room(room_id: str, request: JoinRoomRequest, http_request: Request):
+    admit(client_key(request.player_id, http_request.client), room_id)
     player_id = request.player_id or str(uuid.uuid4())
     
     try:
@@ -96,42 +538,20 @@ async def join_room(room_id: str, request: JoinRoomRequest):
         
         handle = temporal_client.get_workflow_handle(workflow_id)
         
-        # Signal to join
-        await handle.signal(GameRoomWorkflow.join_game, JoinRoomInput(room_id=room_id, player_id=player_id))
-        
-        # Give time for the workflow to process the join
-        await asyncio.sleep(0.3)
-        
-        # Query game state
-        state = await handle.query(GameRoomWorkflow.get_state)
+        # Join and get the resulting game state in a single round trip
+        async with temporal_rpc():
+            state = await handle.execute_update(
+                GameRoomWorkflow.join,
+                JoinRoomInput(room_id=room_id, player_id=player_id),
+            )
         
         # Broadcast updated state to all connected clients in the room
-        if room_id in active_connections:
-            await broadcast_to_room(room_id, {
-                "type": "state_update",
-                "state": {
-                    "board": [[cell for cell in row] for row in state.board.grid],
-                    "players": state.players,
-                    "current_turn": state.current_turn,
-                    "game_status": state.game_status,
-                    "winner": state.winner,
-                    "move_deadline": state.move_deadline
-                }
-            })
+        await publish_state(room_id, state)
         
         # Return details to client
-        return {
-            "room_id": room_id,
-            "player_id": player_id,
-            "state": {
-                "board": [[cell for cell in row] for row in state.board.grid],
-                "players": state.players,
-                "current_turn": state.current_turn,
-                "game_status": state.game_status,
-                "winner": state.winner,
-                "move_deadline": state.move_deadline
-            }
-        }
+        return state_response({"room_id": room_id, "player_id": player_id}, room_id, state)
+    except AdmissionError:
+        raise
     except Exception as e:
         print(f"Error joining room {room_id}: {str(e)}")
         raise HTTPException(status_code=404, detail=f"Room not found or full: {str(e)}")
@@ -139,240 +559,459 @@ async def join_room(room_id: str, request: JoinRoomRequest):
 
 @app.post("/rooms/{room_id}/move")
 async def make_move(room_id: str, request: MoveRequest):
+    admit(client_key(request.player_id, None), room_id)
+    started = time.perf_counter()
     try:
         # Get workflow handle
-        handle = temporal_client.get_workflow_handle(f"tic-tac-toe-{room_id}")
-        
-        # Send move signal
-        await handle.signal(
-            GameRoomWorkflow.make_move, 
-            MoveInput(room_id=room_id, player_id=request.player_id, x=request.x, y=request.y)
-        )
-        
-        # Query updated game state
-        state = await handle.query(GameRoomWorkflow.get_state)
+        # Send the move, wait for the state after it has been processed and broadcast it
+        state = await submit_move(room_id, request.player_id, request.x, request.y, request.move_id)
+        STATE_VISIBLE_LATENCY.labels("rest").observe(time.perf_counter() - started)
         
-        # Broadcast new game state to all connected clients
-        if room_id in active_connections:
-            await broadcast_to_room(room_id, {
-                "type": "state_update",
-                "state": {
-                    "board": [[cell for cell in row] for row in state.board.grid],
-                    "players": state.players,
-                    "current_turn": state.current_turn,
-                    "game_status": state.game_status,
-                    "winner": state.winner,
-                    "move_deadline": state.move_deadline
-                }
-            })
-        
-        return {
-            "success": True,
-            "state": {
-                "board": [[cell for cell in row] for row in state.board.grid],
-                "players": state.players,
-                "current_turn": state.current_turn,
-                "game_status": state.game_status,
-                "winner": state.winner,
-                "move_deadline": state.move_deadline
-            }
-        }
+        return state_response({"success": True}, room_id, state)
+    except AdmissionError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid move: {str(e)}")
 
 
-@app.get("/rooms/{room_id}/state")
-async def get_state(room_id: str):
+@app.post("/rooms/{room_id}/rematch")
+async def request_rematch(room_id: str, request: RematchRequest):
+    admit(client_key(request.player_id, None), room_id)
     try:
-        # Get workflow handle
         handle = temporal_client.get_workflow_handle(f"tic-tac-toe-{room_id}")
         
-        # Query game state
-        state = await handle.query(GameRoomWorkflow.get_state)
+        # The room starts a new match once every player has asked for one
+        async with temporal_rpc():
+            state = await handle.execute_update(
+                GameRoomWorkflow.request_rematch,
+                JoinRoomInput(room_id=room_id, player_id=request.player_id),
+            )
+        await publish_state(room_id, state)
+        
+        return state_response({"success": True}, room_id, state)
+    except AdmissionError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Rematch not possible: {str(e)}")
+
+
+def matchmaking_response(assignment: MatchAssignment) -> dict:
+    return {
+        "status": assignment.status,
+        "player_id": assignment.player_id,
+        "room_id": assignment.room_id,
+        "queue_depth": assignment.queue_depth,
+        "queue_position": assignment.queue_position,
+    }
+
+
+def matchmaker_unavailable(e: Exception) -> HTTPException:
+    """429 when Temporal refuses the matchmaker more updates for now, 503 for any other failure"""
+    if isinstance(e, RPCError) and e.status == RPCStatusCode.RESOURCE_EXHAUSTED:
+        return HTTPException(
+            status_code=429,
+            detail="Matchmaker is busy, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    print(f"Matchmaking failed: {str(e)}")
+    return HTTPException(status_code=503, detail=f"Matchmaker unavailable: {str(e)}")
+
+
+@app.post("/matchmaking")
+async def find_match(request: MatchmakingRequest, http_request: Request):
+    """
+    Queue the player and return at once with status "queued" and their queue
+    position, or "matched" and the room. Poll GET /matchmaking/{player_id} for the room.
+    """
+    admit(client_key(request.player_id, http_request.client), address=client_address(http_request.client))
+    player_id = request.player_id or str(uuid.uuid4())
+    win_length = resolve_win_length(request.board_size, request.win_length)
+    check_best_of(request.best_of)
+    
+    try:
+        # Starts the matchmaker if it is not running, and enqueues in the same round trip
+        async with temporal_rpc():
+            assignment = await temporal_client.execute_update_with_start_workflow(
+                MatchmakerWorkflow.enqueue,
+                MatchmakingInput(
+                    player_id=player_id,
+                    board_size=request.board_size,
+                    win_length=win_length,
+                    best_of=request.best_of,
+                    room_shards=shard_map.shards,
+                ),
+                start_workflow_operation=WithStartWorkflowOperation(
+                    MatchmakerWorkflow.run,
+                    MatchmakerInput(),
+                    id=MATCHMAKER_WORKFLOW_ID,
+                    task_queue=shard_map.control_queue,
+                    id_conflict_policy=WorkflowIDConflictPolicy.USE_EXISTING,
+                ),
+            )
+    except AdmissionError:
+        raise
+    except Exception as e:
+        raise matchmaker_unavailable(e)
+    
+    return matchmaking_response(assignment)
+
+
+@app.get("/matchmaking/{player_id}")
+async def poll_match(player_id: str, http_request: Request):
+    """Where a queued player stands: "queued" with their position, or "matched" and the room"""
+    admit(client_key(player_id, http_request.client))
+    try:
+        handle = temporal_client.get_workflow_handle(MATCHMAKER_WORKFLOW_ID)
+        async with temporal_rpc():
+            assignment = await handle.query(MatchmakerWorkflow.assignment, player_id)
+            if assignment.status == "matched":
+                # The room is handed out once, a later enqueue queues the player again
+                await handle.signal(MatchmakerWorkflow.leave, player_id)
+    except AdmissionError:
+        raise
+    except Exception as e:
+        raise matchmaker_unavailable(e)
+    if assignment.status == "not_queued":
+        raise HTTPException(status_code=404, detail="Player is not queued")
+    return matchmaking_response(assignment)
+
+
+@app.get("/matchmaking")
+async def matchmaking_stats(http_request: Request):
+    read_limiter.check(client_address(http_request.client))
+    try:
+        handle = temporal_client.get_workflow_handle(MATCHMAKER_WORKFLOW_ID)
+        async with temporal_rpc():
+            stats = await handle.query(MatchmakerWorkflow.stats)
+    except AdmissionError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"Matchmaker not running: {str(e)}")
+    return {
+        "queue_depth": stats.queue_depth,
+        "waiting": stats.waiting,
+        "matches_started": stats.matches_started,
+    }
+
+
+@app.delete("/matchmaking/{player_id}")
+async def leave_matchmaking(player_id: str):
+    admit(client_key(player_id, None))
+    try:
+        handle = temporal_client.get_workflow_handle(MATCHMAKER_WORKFLOW_ID)
+        async with temporal_rpc():
+            await handle.signal(MatchmakerWorkflow.leave, player_id)
+    except AdmissionError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=f"Matchmaker not running: {str(e)}")
+    return {"success": True}
+
+
+@app.get("/games/export")
+async def export_games(room_id: Optional[str] = None, after_seq: int = 0):
+    """
+    Stream archived games as NDJSON, oldest first. Each line has a seq, pass the
+    last one seen as after_seq to continue an interrupted export.
+    """
+    return StreamingResponse(
+        export_records(archive_path(), room_id=room_id, after_seq=after_seq),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape of this server process"""
+    if not metrics_available():
+        raise HTTPException(status_code=503, detail="prometheus_client is not installed")
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/rooms")
+async def list_rooms(status: Optional[str] = None, limit: int = Query(100, ge=1, le=MAX_BATCH_ROOMS)):
+    """Rooms from the server's room index, without querying Temporal"""
+    if status is not None and status not in ROOM_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(ROOM_STATUSES)}")
+    return {
+        "rooms": [dataclasses.asdict(summary) for summary in room_index.rooms(status, limit)],
+        "counts": room_index.counts(),
+    }
+
+
+@app.post("/rooms/state:batch")
+async def get_states(request: RoomStateBatchRequest, http_request: Request):
+    """States of up to MAX_BATCH_ROOMS rooms in one call"""
+    if any(state_cache.get(room_id) is None for room_id in request.room_ids):
+        # Only reads that reach Temporal are charged, cached states cost nothing to serve
+        read_limiter.check(client_address(http_request.client))
+    states, errors = await fetch_states(request.room_ids)
+    # Spliced together from the encoded state cache rather than encoding a thousand states again
+    encoded = b",".join(dumps(room_id) + b":" + encoded_states.get(room_id, state) for room_id, state in states.items())
+    return JSONBytesResponse(b'{"states":{' + encoded + b'},"errors":' + dumps(errors) + b"}")
+
+
+@app.get("/rooms/{room_id}/state")
+async def get_state(room_id: str, http_request: Request):
+    if state_cache.get(room_id) is None:
+        # Only reads that reach Temporal are charged, cached states cost nothing to serve
+        read_limiter.check(client_address(http_request.client))
+    try:
+        # Cached unless the room changed since the last read
+        state = await fetch_state(room_id)
         
         # Return state to client
-        return {
-            "room_id": room_id,
-            "state": {
-                "board": [[cell for cell in row] for row in state.board.grid],
-                "players": state.players,
-                "current_turn": state.current_turn,
-                "game_status": state.game_status,
-                "winner": state.winner,
-                "move_deadline": state.move_deadline
-            }
-        }
+        return state_response({"room_id": room_id}, room_id, state)
+    except AdmissionError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Room not found: {str(e)}")
 
 
+async def send_snapshot(sender: ConnectionSender, room_id: str):
+    try:
+        state = await fetch_state(room_id)
+        await sender.send_message(OutgoingMessage({"type": "snapshot", "seq": state.version}, room_id, state))
+    except AdmissionError as e:
+        await sender.send_message(rejection_message(e))
+    except Exception as e:
+        await sender.send_message({
+            "type": "error",
+            "message": f"Failed to get state: {str(e)}"
+        })
+
+
 @app.websocket("/ws/rooms/{room_id}")
-async def websocket_endpoint(websocket: WebSocket, room_id: str):
-    await websocket.accept()
+async def websocket_endpoint(websocket: WebSocket, room_id: str, role: str = "player", mode: Optional[str] = None):
+    """
+    Room WebSocket. Players get full state updates by default. Spectators
+    (?role=spectator) cannot create, join or move, and default to the delta
+    protocol: one snapshot followed by deltas (?mode=delta|full). Clients
+    offering the "msgpack" subprotocol exchange MessagePack binary frames
+    instead of JSON text frames.
+    """
+    if role not in ("player", "spectator") or mode not in (None, "full", "delta"):
+        await websocket.close(code=1008)
+        return
+    binary = MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", []) and msgpack_available()
+    await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL if binary else None)
     
     # Add connection to the room
+    delta = mode == "delta" if mode else role == "spectator"
+    sender = ConnectionSender(
+        websocket,
+        on_close=lambda _: remove_connection(room_id, websocket),
+        role=role,
+        delta=delta,
+        binary=binary,
+    )
     if room_id not in active_connections:
-        active_connections[room_id] = set()
-    active_connections[room_id].add(websocket)
+        active_connections[room_id] = {}
+    active_connections[room_id][websocket] = sender
+    WEBSOCKET_CONNECTIONS.labels(room_id).inc()
+    follow_room(room_id)
+    if delta:
+        await send_snapshot(sender, room_id)
     
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            data = await (websocket.receive_bytes() if binary else websocket.receive_text())
+            message = loads(data, binary)
+            sender.last_seen = time.monotonic()
+            if message["action"] == "pong":
+                # Heartbeat answer, only needs to refresh last_seen
+                continue
             
-            # Process client message based on action type
-            if message["action"] == "create":
-                player_id = message.get("player_id", str(uuid.uuid4()))
-                handle = await temporal_client.start_workflow(
-                    GameRoomWorkflow.run,
-                    CreateRoomInput(creator_id=player_id, room_id=room_id),
-                    id=f"tic-tac-toe-{room_id}",
-                    task_queue="tic-tac-toe-task-queue",
+            try:
+                # Every action counts against the player, those changing a room also against the room
+                room_action = message["action"] in ("create", "join", "move", "rematch")
+                admit(
+                    client_key(message.get("player_id"), websocket.client),
+                    room_id if room_action else None,
+                    # Creating rooms also counts against the address, player IDs are the client's to pick
+                    client_address(websocket.client) if message["action"] == "create" else None,
                 )
-                state = await handle.query(GameRoomWorkflow.get_state)
-                await websocket.send_json({
-                    "type": "room_created",
-                    "room_id": room_id,
-                    "player_id": player_id,
-                    "state": {
-                        "board": [[cell for cell in row] for row in state.board.grid],
-                        "players": state.players,
-                        "current_turn": state.current_turn,
-                        "game_status": state.game_status,
-                        "winner": state.winner,
-                        "move_deadline": state.move_deadline
-                    }
-                })
-            
-            elif message["action"] == "join":
-                player_id = message.get("player_id", str(uuid.uuid4()))
-                try:
-                    handle = temporal_client.get_workflow_handle(f"tic-tac-toe-{room_id}")
-                    await handle.signal(
-                        GameRoomWorkflow.join_game, 
-                        JoinRoomInput(room_id=room_id, player_id=player_id)
-                    )
-                    
-                    # Give the workflow a moment to process the join and update game state
-                    await asyncio.sleep(0.5)
-                    
-                    # Query for updated state after player joined and game possibly became active
-                    state = await handle.query(GameRoomWorkflow.get_state)
-                    
-                    # Broadcast player joined event
-                    await broadcast_to_room(room_id, {
-                        "type": "player_joined",
-                        "player_id": player_id,
-                        "state": {
-                            "board": [[cell for cell in row] for row in state.board.grid],
-                            "players": state.players,
-                            "current_turn": state.current_turn,
-                            "game_status": state.game_status,
-                            "winner": state.winner,
-                            "move_deadline": state.move_deadline
-                        }
-                    })
-                    
-                    # Send an additional state update with a slight delay to ensure all clients get updated
-                    await asyncio.sleep(0.5)
-                    
-                    # Query again to get the absolute latest state
-                    state = await handle.query(GameRoomWorkflow.get_state)
-                    
-                    # Send explicit state update to ensure everyone is in sync
-                    await broadcast_to_room(room_id, {
-                        "type": "state_update",
-                        "state": {
-                            "board": [[cell for cell in row] for row in state.board.grid],
-                            "players": state.players,
-                            "current_turn": state.current_turn,
-                            "game_status": state.game_status,
-                            "winner": state.winner,
-                            "move_deadline": state.move_deadline
-                        }
-                    })
-                except Exception as e:
-                    await websocket.send_json({
+                
+                # Spectators only watch, they never take a player slot
+                if role == "spectator" and room_action:
+                    await sender.send_message({
                         "type": "error",
-                        "message": f"Failed to join room: {str(e)}"
-                    })
-            
-            elif message["action"] == "move":
-                player_id = message["player_id"]
-                x, y = message["x"], message["y"]
-                try:
-                    handle = temporal_client.get_workflow_handle(f"tic-tac-toe-{room_id}")
-                    await handle.signal(
-                        GameRoomWorkflow.make_move,
-                        MoveInput(room_id=room_id, player_id=player_id, x=x, y=y)
-                    )
-                    state = await handle.query(GameRoomWorkflow.get_state)
-                    await broadcast_to_room(room_id, {
-                        "type": "move_made",
-                        "player_id": player_id,
-                        "x": x,
-                        "y": y,
-                        "state": {
-                            "board": [[cell for cell in row] for row in state.board.grid],
-                            "players": state.players,
-                            "current_turn": state.current_turn,
-                            "game_status": state.game_status,
-                            "winner": state.winner,
-                            "move_deadline": state.move_deadline
-                        }
-                    })
-                except Exception as e:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": f"Invalid move: {str(e)}"
-                    })
-            
-            elif message["action"] == "get_state":
-                try:
-                    handle = temporal_client.get_workflow_handle(f"tic-tac-toe-{room_id}")
-                    state = await handle.query(GameRoomWorkflow.get_state)
-                    await websocket.send_json({
-                        "type": "state_update",
-                        "state": {
-                            "board": [[cell for cell in row] for row in state.board.grid],
-                            "players": state.players,
-                            "current_turn": state.current_turn,
-                            "game_status": state.game_status,
-                            "winner": state.winner,
-                            "move_deadline": state.move_deadline
-                        }
-                    })
-                except Exception as e:
-                    await websocket.send_json({
-                        "type": "error",
-                        "message": f"Failed to get state: {str(e)}"
+                        "message": f"Spectators cannot {message['action']}"
                     })
+                    continue
+                
+                # Process client message based on action type
+                if message["action"] == "resync":
+                    # Sent by delta clients that detected a gap in the sequence numbers
+                    await send_snapshot(sender, room_id)
+                
+                elif message["action"] == "create":
+                    player_id = message.get("player_id", str(uuid.uuid4()))
+                    board_size = message.get("board_size", 3)
+                    if not MIN_BOARD_SIZE <= board_size <= MAX_BOARD_SIZE:
+                        await sender.send_message({
+                            "type": "error",
+                            "message": f"board_size must be between {MIN_BOARD_SIZE} and {MAX_BOARD_SIZE}"
+                        })
+                        continue
+                    best_of = message.get("best_of", 1)
+                    bot_move_budget_ms = message.get("bot_move_budget_ms", 1000)
+                    try:
+                        win_length = resolve_win_length(board_size, message.get("win_length"))
+                        check_best_of(best_of)
+                    except HTTPException as e:
+                        await sender.send_message({"type": "error", "message": e.detail})
+                        continue
+                    if not MIN_BOT_MOVE_BUDGET_MS <= bot_move_budget_ms <= MAX_BOT_MOVE_BUDGET_MS:
+                        await sender.send_message({
+                            "type": "error",
+                            "message": f"bot_move_budget_ms must be between {MIN_BOT_MOVE_BUDGET_MS} and {MAX_BOT_MOVE_BUDGET_MS}"
+                        })
+                        continue
+                    clock_ms = message.get("clock_ms", 0)
+                    increment_ms = message.get("increment_ms", 0)
+                    if not (0 <= clock_ms <= MAX_CLOCK_MS and 0 <= increment_ms <= MAX_INCREMENT_MS):
+                        await sender.send_message({
+                            "type": "error",
+                            "message": f"clock_ms must be between 0 and {MAX_CLOCK_MS}, increment_ms between 0 and {MAX_INCREMENT_MS}"
+                        })
+                        continue
+                    async with temporal_rpc():
+                        handle = await temporal_client.start_workflow(
+                            GameRoomWorkflow.run,
+                            CreateRoomInput(
+                                creator_id=player_id,
+                                room_id=room_id,
+                                board_size=board_size,
+                                win_length=win_length,
+                                best_of=best_of,
+                                vs_bot=bool(message.get("vs_bot", False)),
+                                bot_move_budget_ms=bot_move_budget_ms,
+                                clock_ms=clock_ms,
+                                increment_ms=increment_ms,
+                                lobby_ttl_ms=LOBBY_TTL_SECONDS * 1000,
+                            ),
+                            id=f"tic-tac-toe-{room_id}",
+                            task_queue=shard_map.room_queue(room_id),
+                        )
+                        state = await handle.query(GameRoomWorkflow.get_state)
+                    state_cache.put(room_id, state)
+                    follow_room(room_id)
+                    await sender.send_message(OutgoingMessage(
+                        {"type": "room_created", "room_id": room_id, "player_id": player_id},
+                        room_id,
+                        state,
+                    ))
+                    # Published so every server lists the new room
+                    await publish_state(room_id, state)
+                
+                elif message["action"] == "join":
+                    player_id = message.get("player_id", str(uuid.uuid4()))
+                    try:
+                        handle = temporal_client.get_workflow_handle(f"tic-tac-toe-{room_id}")
+                        # Join and get the state after the player joined in a single round trip
+                        async with temporal_rpc():
+                            state = await handle.execute_update(
+                                GameRoomWorkflow.join,
+                                JoinRoomInput(room_id=room_id, player_id=player_id),
+                            )
+                        
+                        # Broadcast the new state once to everyone in the room
+                        follow_room(room_id)
+                        await publish_state(room_id, state)
+                    except AdmissionError:
+                        raise
+                    except Exception as e:
+                        await sender.send_message({
+                            "type": "error",
+                            "message": f"Failed to join room: {str(e)}"
+                        })
+                
+                elif message["action"] == "move":
+                    player_id = message["player_id"]
+                    x, y = message["x"], message["y"]
+                    started = time.perf_counter()
+                    try:
+                        follow_room(room_id)
+                        await submit_move(room_id, player_id, x, y, message.get("move_id"))
+                        STATE_VISIBLE_LATENCY.labels("websocket").observe(time.perf_counter() - started)
+                    except AdmissionError:
+                        raise
+                    except Exception as e:
+                        await sender.send_message({
+                            "type": "error",
+                            "message": f"Invalid move: {str(e)}"
+                        })
+                
+                elif message["action"] == "rematch":
+                    try:
+                        handle = temporal_client.get_workflow_handle(f"tic-tac-toe-{room_id}")
+                        async with temporal_rpc():
+                            state = await handle.execute_update(
+                                GameRoomWorkflow.request_rematch,
+                                JoinRoomInput(room_id=room_id, player_id=message["player_id"]),
+                            )
+                        follow_room(room_id)
+                        await publish_state(room_id, state)
+                    except AdmissionError:
+                        raise
+                    except Exception as e:
+                        await sender.send_message({
+                            "type": "error",
+                            "message": f"Rematch not possible: {str(e)}"
+                        })
+                
+                elif message["action"] == "get_state":
+                    try:
+                        state = await fetch_state(room_id)
+                        await sender.send_message(OutgoingMessage({"type": "state_update"}, room_id, state))
+                    except AdmissionError:
+                        raise
+                    except Exception as e:
+                        await sender.send_message({
+                            "type": "error",
+                            "message": f"Failed to get state: {str(e)}"
+                        })
+            except AdmissionError as e:
+                await sender.send_message(rejection_message(e))
     
     except WebSocketDisconnect:
         # Remove connection when client disconnects
-        if room_id in active_connections:
-            active_connections[room_id].remove(websocket)
-            if not active_connections[room_id]:
-                del active_connections[room_id]
+        remove_connection(room_id, websocket)
 
 
-async def broadcast_to_room(room_id: str, message: dict):
-    """Send a message to all WebSocket connections in a room"""
-    if room_id in active_connections:
-        disconnected = set()
-        for connection in active_connections[room_id]:
-            try:
-                await connection.send_json(message)
-            except RuntimeError:  # Connection already closed
-                disconnected.add(connection)
-        
-        # Clean up disconnected clients
-        for conn in disconnected:
-            active_connections[room_id].remove(conn)
-        if not active_connections[room_id]:
-            del active_connections[room_id]
+def remove_connection(room_id: str, websocket: WebSocket):
+    """Drop a connection from its room, and stop following rooms nobody is watching"""
+    connections = active_connections.get(room_id)
+    if not connections:
+        return
+    sender = connections.pop(websocket, None)
+    if sender:
+        sender.close()
+        WEBSOCKET_CONNECTIONS.labels(room_id).dec()
+    if not connections:
+        release_room(room_id)
+
+
+def release_room(room_id: str):
+    """Close the room's remaining connections, and stop following and remembering it"""
+    connections = active_connections.pop(room_id, None)
+    if connections is not None:
+        for sender in connections.values():
+            sender.close()
+        WEBSOCKET_CONNECTIONS.remove(room_id)
+    change_feed.unsubscribe(room_id)
+    broadcast_states.pop(room_id, None)
 
 
 if __name__ == "__main__":
-    uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    # Several workers need a shared room bus, e.g. ROOM_BUS_URL=unix:///tmp/tic-tac-toe-bus.sock
+    workers = int(os.environ.get("SERVER_WORKERS", "1"))
+    if workers > 1 and not os.environ.get("ROOM_BUS_URL", "").startswith("unix://"):
+        raise SystemExit("SERVER_WORKERS > 1 needs a shared ROOM_BUS_URL, e.g. unix:///tmp/tic-tac-toe-bus.sock")
+    if workers > 1:
+        uvicorn.run("server:app", host="0.0.0.0", port=8000, workers=workers)
+    else:
+        uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
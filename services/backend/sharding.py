@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Tuple
+
+from temporalio.client import Client
+
+
+BASE_TASK_QUEUE = "tic-tac-toe-task-queue"
+
+# Points per shard on the hash ring, keeping each shard within about 15% of an even share of rooms
+VIRTUAL_NODES = 256
+
+
+def _hash(key: str) -> int:
+    # Stable across processes and Python versions, unlike hash()
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+@lru_cache(maxsize=None)
+def _ring(shards: int) -> Tuple[List[int], List[int]]:
+    points = sorted((_hash(f"shard-{shard}-{node}"), shard) for shard in range(shards) for node in range(VIRTUAL_NODES))
+    return [point for point, _ in points], [shard for _, shard in points]
+
+
+@dataclass(frozen=True)
+class ShardMap:
+    """
+    Maps rooms onto task queues by consistent hashing of the room ID.
+
+    Shard 0 keeps the base queue name, so a single shard is the unsharded
+    setup, and also runs the matchmaker. A room stays on the queue it was
+    started on for its whole life, continue-as-new included: changing the
+    shard count only routes new rooms, and going from n to n + 1 shards
+    moves only about 1 / (n + 1) of the room IDs. Queues of shards that
+    were removed need a worker until their rooms have finished.
+    """
+
+    shards: int = 1
+    base_queue: str = BASE_TASK_QUEUE
+
+    def __post_init__(self) -> None:
+        if self.shards < 1:
+            raise ValueError(f"Shard count must be at least 1, got {self.shards}")
+
+    @classmethod
+    def from_env(cls) -> "ShardMap":
+        """ROOM_SHARDS and TASK_QUEUE, set the same for servers and workers"""
+        return cls(
+            shards=int(os.environ.get("ROOM_SHARDS", "1")),
+            base_queue=os.environ.get("TASK_QUEUE", BASE_TASK_QUEUE),
+        )
+
+    @property
+    def control_queue(self) -> str:
+        """Queue of the matchmaker"""
+        return self.queue(0)
+
+    def queue(self, shard: int) -> str:
+        return self.base_queue if shard == 0 else f"{self.base_queue}-{shard}"
+
+    def shard_of(self, room_id: str) -> int:
+        points, shards = _ring(self.shards)
+        index = bisect.bisect(points, _hash(room_id)) % len(points)
+        return shards[index]
+
+    def room_queue(self, room_id: str) -> str:
+        return self.queue(self.shard_of(room_id))
+
+    def parse(self, spec: str) -> List[int]:
+        """Shards from "all" or a list of shards and ranges like "0,2,4-7", which may go past the shard count"""
+        if spec == "all":
+            return list(range(self.shards))
+        shards = set()
+        for part in spec.split(","):
+            first, _, last = part.strip().partition("-")
+            shards.update(range(int(first), int(last or first) + 1))
+        return sorted(shards)
+
+
+async def count_running(address: str, shard_map: ShardMap, shards: List[int]) -> None:
+    """Print the running workflows per shard queue, e.g. to check removed shards have drained"""
+    client = await Client.connect(address)
+    for shard in shards:
+        queue = shard_map.queue(shard)
+        count = await client.count_workflows(f"TaskQueue = '{queue}' AND ExecutionStatus = 'Running'")
+        print(f"shard {shard} ({queue}): {count.count} running")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Running workflows per room shard")
+    parser.add_argument("--address", default=os.environ.get("TEMPORAL_ADDRESS", "localhost:7233"))
+    parser.add_argument("--shards", default="all", help='"all" or shards and ranges like "0,2,4-7"')
+    args = parser.parse_args()
+    shard_map = ShardMap.from_env()
+    asyncio.run(count_running(args.address, shard_map, shard_map.parse(args.shards)))
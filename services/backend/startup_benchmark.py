@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict
+
+from temporalio.client import Client
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Worker
+from temporalio.worker.workflow_sandbox import SandboxedWorkflowRunner
+
+from activities import archive_game, check_game_state, validate_move
+from models import CreateRoomInput
+from payload_converter import game_data_converter
+from workflows import GameRoomWorkflow
+
+
+TASK_QUEUE = "tic-tac-toe-startup-benchmark"
+
+
+def import_time(module: str, runs: int) -> float:
+    """Median seconds a fresh interpreter takes to import a module"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    samples = [
+        float(subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout)
+        for _ in range(runs)
+    ]
+    return statistics.median(samples)
+
+
+def sandbox_instance_time(runs: int) -> float:
+    """
+    Median milliseconds to create a sandboxed GameRoomWorkflow instance. The
+    worker pays this for every workflow run that is not in its cache, as the
+    sandbox re-imports the workflow module for each instance.
+    """
+    runner = SandboxedWorkflowRunner()
+    defn = GameRoomWorkflow.__temporal_workflow_definition
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        runner.prepare_workflow(defn)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def worker_startup(client: Client, runs: int) -> Dict:
+    """Median worker boot time, and latency until a new room's first workflow task completes"""
+    boot = []
+    first_task = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        worker = Worker(
+            client,
+            task_queue=TASK_QUEUE,
+            workflows=[GameRoomWorkflow],
+            activities=[validate_move, check_game_state, archive_game],
+        )
+        async with worker:
+            boot.append(time.perf_counter() - started)
+
+            room_id = uuid.uuid4().hex[:8]
+            started = time.perf_counter()
+            handle = await client.start_workflow(
+                GameRoomWorkflow.run,
+                CreateRoomInput(creator_id="bench", room_id=room_id),
+                id=f"tic-tac-toe-{room_id}",
+                task_queue=TASK_QUEUE,
+            )
+            # Queries are answered once the first workflow task has run
+            await handle.query(GameRoomWorkflow.get_state)
+            first_task.append((time.perf_counter() - started) * 1000)
+            await handle.terminate()
+    return {
+        "worker_boot_s": round(statistics.median(boot), 4),
+        "first_workflow_task_ms": round(statistics.median(first_task), 3),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Measure worker import time, sandboxed workflow instantiation, worker boot time "
+        "and first workflow task latency, reported as JSON."
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--env", choices=["none", "local", "time-skipping"], default="none",
+                        help="WorkflowEnvironment for the worker boot / first task measurements")
+    parser.add_argument("--address", help="Use an already running Temporal server for those measurements")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    report = {
+        "runs": args.runs,
+        "import_worker_s": round(import_time("worker", args.runs), 4),
+        "sandbox_instance_ms": round(sandbox_instance_time(args.runs), 3),
+    }
+
+    if args.address:
+        report.update(await worker_startup(await Client.connect(args.address, data_converter=game_data_converter()), args.runs))
+    elif args.env != "none":
+        start = WorkflowEnvironment.start_local if args.env == "local" else WorkflowEnvironment.start_time_skipping
+        async with await start(data_converter=game_data_converter()) as env:
+            report.update(await worker_startup(env.client, args.runs))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
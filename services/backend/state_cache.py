@@ -0,0 +1,99 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+from models import BOT_PLAYER_ID, GameState
+
+
+def may_continue(state: GameState) -> bool:
+    """
+    Whether a finished game's room may start another game: the match is not
+    decided yet, or every player asked for a rematch. The winner of the game
+    may not be counted in scores yet, which only ever errs towards True.
+    """
+    wins_needed = state.best_of // 2 + 1
+    match_decided = state.game_number >= state.best_of or any(
+        wins >= wins_needed for wins in state.scores.values()
+    )
+    return not match_decided or len(state.rematch_requests) == len(state.players)
+
+
+@dataclass
+class CacheEntry:
+    state: GameState
+    expires_at: Optional[float]  # wall clock time after which the entry must be refreshed
+
+
+class GameStateCache:
+    """
+    In-process cache of the latest known GameState per room.
+
+    Entries are versioned by GameState.version, so an older state never
+    replaces a newer one. Apart from bot moves, the workflow only changes
+    state on its own when a turn times out or a lobby expires, so an active
+    room's entry stays valid until its move deadline and a waiting room's
+    until its lobby deadline. States waiting on the bot are not reused.
+    A finished game whose room goes on to another game of the match or a
+    rematch, in a new run, is kept for continuing_ttl seconds. Other closed
+    rooms are kept for finished_ttl seconds, and the cache evicts the least
+    recently used room once it holds max_rooms entries.
+    """
+
+    def __init__(
+        self,
+        max_rooms: int = 10000,
+        finished_ttl: float = 300.0,
+        continuing_ttl: float = 1.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_rooms = max_rooms
+        self.finished_ttl = finished_ttl
+        self.continuing_ttl = continuing_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, room_id: str) -> Optional[GameState]:
+        """Return the cached state, or None if it is missing or may be stale"""
+        entry = self._entries.get(room_id)
+        if entry is None:
+            return None
+        if entry.expires_at is not None and self._clock() >= entry.expires_at:
+            del self._entries[room_id]
+            return None
+        self._entries.move_to_end(room_id)
+        return entry.state
+
+    def put(self, room_id: str, state: GameState) -> bool:
+        """Store a state unless a newer version is already cached. Returns whether it was stored."""
+        current = self._entries.get(room_id)
+        if current is not None and current.state.version > state.version:
+            return False
+        self._entries[room_id] = CacheEntry(state=state, expires_at=self._expiry(state))
+        self._entries.move_to_end(room_id)
+        while len(self._entries) > self.max_rooms:
+            self._entries.popitem(last=False)
+        return True
+
+    def invalidate(self, room_id: str) -> None:
+        self._entries.pop(room_id, None)
+
+    def _expiry(self, state: GameState) -> Optional[float]:
+        if state.game_status == "finished" and may_continue(state):
+            return self._clock() + self.continuing_ttl
+        if state.game_status in ("finished", "expired"):
+            return self._clock() + self.finished_ttl
+        if state.game_status == "waiting" and state.lobby_deadline_ms:
+            return state.lobby_deadline_ms / 1000
+        if state.game_status == "active" and state.current_turn == BOT_PLAYER_ID:
+            # The bot moves on its own at any moment, only the workflow knows when
+            return self._clock()
+        if state.game_status == "active" and state.move_deadline_ms:
+            return state.move_deadline_ms / 1000
+        if state.game_status == "active" and state.move_deadline:
+            return datetime.fromisoformat(state.move_deadline).timestamp()
+        return None
@@ -0,0 +1,70 @@
+from typing import Dict, List, Optional
+
+from models import GameState
+from serialization import state_dict
+
+
+def state_snapshot(state: GameState) -> Dict:
+    """Full state message that starts (or restarts) a delta stream"""
+    return {"type": "snapshot", "seq": state.version, "state": state_dict(state)}
+
+
+def state_changes(previous: GameState, state: GameState) -> List[Dict]:
+    """Compact list of what changed between two states of the same room"""
+    changes = []
+    if previous.players != state.players:
+        changes.append({"op": "players", "players": state.players})
+
+    # Cells whose mark changed, found by xor-ing the bitboards
+    size = state.board.size
+    changed = (previous.board.x_bits ^ state.board.x_bits) | (previous.board.o_bits ^ state.board.o_bits)
+    while changed:
+        lowest = changed & -changed
+        bit = lowest.bit_length() - 1
+        x, y = bit % size, bit // size
+        changes.append({"op": "cell", "x": x, "y": y, "mark": state.board.get(x, y)})
+        changed ^= lowest
+
+    if (
+        previous.current_turn != state.current_turn
+        or previous.move_deadline_ms != state.move_deadline_ms
+        or previous.clocks_ms != state.clocks_ms
+    ):
+        changes.append({
+            "op": "turn",
+            "current_turn": state.current_turn,
+            "move_deadline": state.move_deadline,
+            "move_deadline_ms": state.move_deadline_ms,
+            "clocks_ms": state.clocks_ms,
+        })
+    if previous.game_status != state.game_status or previous.winner != state.winner:
+        changes.append({"op": "status", "game_status": state.game_status, "winner": state.winner})
+    if (
+        previous.scores != state.scores
+        or previous.game_number != state.game_number
+        or previous.rematch_requests != state.rematch_requests
+    ):
+        changes.append({
+            "op": "match",
+            "best_of": state.best_of,
+            "game_number": state.game_number,
+            "scores": state.scores,
+            "rematch_requests": state.rematch_requests,
+        })
+    return changes
+
+
+def delta_message(previous: Optional[GameState], state: GameState) -> Dict:
+    """
+    Delta from previous to state, carrying both sequence numbers so clients can
+    detect a gap and ask for a resync. Falls back to a snapshot when there is
+    nothing to diff against.
+    """
+    if previous is None or previous.board.size != state.board.size:
+        return state_snapshot(state)
+    return {
+        "type": "delta",
+        "seq": state.version,
+        "prev_seq": previous.version,
+        "changes": state_changes(previous, state),
+    }
@@ -0,0 +1,217 @@
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
+
+from temporalio import activity
+from temporalio.common import MetricMeter
+from temporalio.runtime import PrometheusConfig, Runtime, TelemetryConfig
+from temporalio.worker import ActivityInboundInterceptor, ExecuteActivityInput, Interceptor
+
+# Optional: without prometheus_client the server's metrics are no-ops and /metrics is unavailable
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+# Optional: without the OpenTelemetry API the server creates no spans
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# Optional: Temporal's tracing interceptor also needs the OpenTelemetry SDK
+try:
+    from temporalio.contrib.opentelemetry import TracingInterceptor
+except ImportError:
+    TracingInterceptor = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class _NoopMetric:
+    """Stands in for a Prometheus metric when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def remove(self, *args) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+
+def _metric(kind: str, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Any:
+    if prometheus_client is None:
+        return _NoopMetric()
+    return getattr(prometheus_client, kind)(name, documentation, labels)
+
+
+# Server metrics
+HTTP_REQUEST_LATENCY = _metric(
+    "Histogram", "http_request_duration_seconds", "HTTP request latency per endpoint",
+    ("method", "route", "status"),
+)
+STATE_VISIBLE_LATENCY = _metric(
+    "Histogram", "move_state_visible_seconds",
+    "Time from receiving a move to publishing the room state that includes it",
+    ("transport",),
+)
+WEBSOCKET_CONNECTIONS = _metric(
+    "Gauge", "websocket_connections", "Open WebSocket connections per room", ("room_id",),
+)
+MOVES_REJECTED = _metric(
+    "Counter", "moves_rejected_at_edge", "Moves answered by the server without reaching Temporal",
+    ("reason",),
+)
+REQUESTS_REJECTED = _metric(
+    "Counter", "requests_rejected_by_admission",
+    "Requests refused by rate limits or load shedding before reaching Temporal",
+    ("reason", "transport"),
+)
+TEMPORAL_RPCS_IN_FLIGHT = _metric(
+    "Gauge", "temporal_rpcs_in_flight", "Temporal RPCs sent by request handlers and not yet answered",
+)
+ROOMS = _metric(
+    "Gauge", "rooms",
+    "Rooms by state: live and waiting from the room index, zombie for rooms this server held"
+    " memory for with nobody connected, as found by the last sweep before releasing them",
+    ("state",),
+)
+ROOMS_RELEASED = _metric(
+    "Counter", "rooms_released", "Rooms the sweeper released with nobody connected",
+)
+WEBSOCKETS_PRUNED = _metric(
+    "Counter", "websockets_pruned", "WebSocket connections closed by the sweeper for missing heartbeats",
+)
+BROADCAST_FANOUT_LATENCY = _metric(
+    "Histogram", "broadcast_fanout_seconds",
+    "Time to serialize one room state and queue it on every connection in the room",
+)
+
+
+def metrics_available() -> bool:
+    return prometheus_client is not None
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """Body and content type of a Prometheus scrape of this process"""
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route template, so room
+    IDs in paths do not become labels. Each request also gets a span, which
+    Temporal's tracing interceptor links to the updates it sends.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.tracer = trace.get_tracer(__name__) if trace else None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            if self.tracer is None:
+                await self.app(scope, receive, send_with_status)
+            else:
+                with self.tracer.start_as_current_span(f"{scope['method']} {scope['path']}") as span:
+                    await self.app(scope, receive, send_with_status)
+                    span.update_name(f"{scope['method']} {self._route(scope)}")
+                    span.set_attribute("http.status_code", status)
+        finally:
+            HTTP_REQUEST_LATENCY.labels(scope["method"], self._route(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+    @staticmethod
+    def _route(scope) -> str:
+        # Set by the router once it matched the request
+        route = scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+
+def temporal_runtime(metrics_address: Optional[str]) -> Optional[Runtime]:
+    """
+    Runtime exporting the Temporal SDK's metrics (workflow task latencies,
+    activity latencies, poller and cache stats, ...) on
+    http://<metrics_address>/metrics. None keeps the default runtime.
+    """
+    if not metrics_address:
+        return None
+    logger.info(f"Serving Temporal metrics on http://{metrics_address}/metrics")
+    return Runtime(telemetry=TelemetryConfig(metrics=PrometheusConfig(bind_address=metrics_address)))
+
+
+def offset_metrics_address(metrics_address: str, offset: int) -> str:
+    """host:port+offset, gives each process of a pool its own metrics port"""
+    if not metrics_address:
+        return metrics_address
+    host, port = metrics_address.rsplit(":", 1)
+    return f"{host}:{int(port) + offset}"
+
+
+def temporal_interceptors() -> List[Interceptor]:
+    """Client interceptors, also used by the workers created from that client"""
+    return [TracingInterceptor()] if TracingInterceptor else []
+
+
+class ActivityMetricsInterceptor(Interceptor):
+    """
+    Records, as each activity attempt finishes, the time since the activity
+    was first scheduled. For the last attempt this is its schedule-to-close
+    latency, queueing and retries included.
+    """
+
+    def __init__(self, meter: MetricMeter) -> None:
+        self.histogram = meter.create_histogram(
+            "activity_schedule_to_close_latency",
+            "Time from scheduling an activity to its final attempt finishing",
+            "ms",
+        )
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _ActivityMetricsInbound(next, self.histogram)
+
+
+class _ActivityMetricsInbound(ActivityInboundInterceptor):
+    def __init__(self, next: ActivityInboundInterceptor, histogram) -> None:
+        super().__init__(next)
+        self.histogram = histogram
+
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        # Runs in the worker process even for activities executed in a
+        # process pool, so the worker's meter is used instead of activity.metric_meter()
+        info = activity.info()
+        try:
+            return await super().execute_activity(input)
+        finally:
+            elapsed = datetime.now(timezone.utc) - info.scheduled_time
+            self.histogram.record(
+                max(0, int(elapsed.total_seconds() * 1000)),
+                {"activity_type": info.activity_type, "task_queue": info.task_queue},
+            )
@@ -0,0 +1,70 @@
+import asyncio
+
+from temporalio.client import WorkflowUpdateRPCTimeoutOrCancelledError
+from temporalio.service import RPCError, RPCStatusCode
+
+from change_feed import ChangeFeed
+
+
+class PendingHandle:
+    """Workflow handle whose wait_for_change never returns, cancelled the way the SDK does it"""
+
+    def __init__(self, calls: list) -> None:
+        self._calls = calls
+
+    async def execute_update(self, update, after_version):
+        if self._calls:
+            # Polled again after being cancelled: end the follower so the test fails rather than hangs
+            raise RPCError("polled after cancel", RPCStatusCode.NOT_FOUND, b"")
+        self._calls.append(after_version)
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError as err:
+            raise WorkflowUpdateRPCTimeoutOrCancelledError() from err
+
+
+class PendingClient:
+    def __init__(self) -> None:
+        self.calls: list = []
+
+    def get_workflow_handle(self, workflow_id: str) -> PendingHandle:
+        calls: list = []
+        self.calls.append(calls)
+        return PendingHandle(calls)
+
+
+async def _noop_listener(room_id, state) -> None:
+    pass
+
+
+def test_unsubscribe_stops_the_follower():
+    async def scenario():
+        client = PendingClient()
+        feed = ChangeFeed(client, _noop_listener)
+        feed.subscribe("room")
+        task = feed._tasks["room"]
+        await asyncio.sleep(0)
+        feed.unsubscribe("room")
+        await asyncio.wait([task], timeout=1)
+        assert task.cancelled()
+        assert client.calls == [[-1]]
+
+    asyncio.run(scenario())
+
+
+def test_close_returns_once_followers_stop():
+    async def scenario():
+        client = PendingClient()
+        feed = ChangeFeed(client, _noop_listener)
+        for room_id in ("a", "b"):
+            feed.subscribe(room_id)
+        tasks = list(feed._tasks.values())
+        await asyncio.sleep(0)
+        closing = asyncio.create_task(feed.close())
+        done, _ = await asyncio.wait([closing], timeout=1)
+        assert closing in done
+        assert all(task.cancelled() for task in tasks)
+        assert feed.following() == []
+        assert client.calls == [[-1], [-1]]
+
+    asyncio.run(scenario())
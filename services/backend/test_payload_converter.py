@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pytest
+from google.protobuf import json_format
+from temporalio.api.history.v1 import History
+
+from models import Board, CheckGameStateInput, CheckMoveInput
+from payload_converter import game_data_converter
+
+
+# Recorded before Board held two bitmasks, its activity inputs carry {"grid": [[...]]} boards
+GRID_BOARD_HISTORY = Path(__file__).parent / "histories" / "activity-rules-game.json"
+
+ACTIVITY_INPUTS = {"validate_move": CheckMoveInput, "check_game_state": CheckGameStateInput}
+
+
+@pytest.mark.parametrize("encoding", ["compact", "json"])
+def test_grid_board_activity_inputs_decode(encoding: str):
+    history = json_format.Parse(GRID_BOARD_HISTORY.read_text(), History(), ignore_unknown_fields=True)
+    converter = game_data_converter(encoding).payload_converter
+    decoded = []
+    for event in history.events:
+        scheduled = event.activity_task_scheduled_event_attributes
+        if scheduled.activity_type.name in ACTIVITY_INPUTS:
+            hint = ACTIVITY_INPUTS[scheduled.activity_type.name]
+            decoded.append(converter.from_payloads(scheduled.input.payloads, [hint])[0])
+
+    assert decoded
+    # The last input is the board after the final move, X in a corner and O on the right
+    board = decoded[-1].board
+    assert board.grid == [["X", None, None], [None, None, "O"], [None, None, None]]
+    assert (board.size, board.win_length, board.occupied) == (3, 3, 2)
+
+
+def test_bitmask_board_round_trips_as_json():
+    board = Board.new_board(5, 4)
+    board.place(2, 3, "O")
+    converter = game_data_converter("json").payload_converter
+    assert converter.from_payloads(converter.to_payloads([board]), [Board])[0] == board
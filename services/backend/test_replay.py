@@ -0,0 +1,27 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from replay import load_file_histories, replay
+
+
+# Room and matchmaker histories from before and after each workflow patch, replayed offline
+HISTORIES = Path(__file__).parent / "histories"
+
+# Exported from runs on a Temporal server, or recorded with record_histories.py
+RECORDED = sorted(path for path in HISTORIES.glob("*.json") if not path.stem.startswith("synthetic-"))
+
+# Assembled event by event, where no server was at hand to record the scenario. They only check the
+# workflow against the commands their author expected, record_histories.py replaces them with real runs.
+SYNTHETIC = sorted(HISTORIES.glob("synthetic-*.json"))
+
+
+@pytest.mark.parametrize("path", RECORDED, ids=lambda path: path.stem)
+def test_recorded_history_replays_deterministically(path: Path):
+    assert asyncio.run(replay(load_file_histories([path]))) == 0
+
+
+@pytest.mark.parametrize("path", SYNTHETIC, ids=lambda path: path.stem)
+def test_synthetic_history_replays_deterministically(path: Path):
+    assert asyncio.run(replay(load_file_histories([path]))) == 0
@@ -1,31 +1,166 @@
+import argparse
 import asyncio
+import contextlib
 import logging
+import multiprocessing
+import os
+import signal
+import sys
+from dataclasses import dataclass, replace
+from datetime import timedelta
 
 from temporalio.client import Client
+from temporalio.runtime import Runtime
 from temporalio.worker import Worker
 
-from activities import check_game_state, validate_move
-from workflows import GameRoomWorkflow
+from activities import archive_game, check_game_state, validate_move
+from payload_converter import game_data_converter
+from sharding import BASE_TASK_QUEUE, ShardMap
+from telemetry import ActivityMetricsInterceptor, offset_metrics_address, temporal_interceptors, temporal_runtime
+from workflows import GameRoomWorkflow, MatchmakerWorkflow
 
 
-async def run_worker():
+@dataclass
+class WorkerConfig:
+    """Worker settings, each one can be set from the environment or the command line"""
+    address: str = "localhost:7233"
+    task_queue: str = BASE_TASK_QUEUE  # queue of shard 0, the other shards' queues are named after it
+    room_shards: int = 1  # shard count, the same as the servers' (see sharding.py)
+    shards: str = "all"  # shards polled by this worker, "all" or e.g. "0,2,4-7"
+    processes: int = 1  # worker processes polling the same shards
+    max_concurrent_workflow_tasks: int = 100
+    max_concurrent_activities: int = 100
+    max_cached_workflows: int = 1000  # sticky cache size per process, split evenly between its shards
+    workflow_task_pollers: int = 5
+    activity_task_pollers: int = 5
+    graceful_shutdown_seconds: float = 10.0  # time in-flight activities get on shutdown
+    metrics_address: str = "127.0.0.1:9464"  # Prometheus endpoint, "" to disable; pool processes use the next ports
+
+
+async def run_worker(config: WorkerConfig = WorkerConfig()):
     # Set up logging
     logging.basicConfig(level=logging.INFO)
-    
-    # Connect to Temporal server
-    client = await Client.connect("localhost:7233")
-    
-    # Run a worker for the workflows and activities
-    logging.info("Starting Temporal worker")
-    worker = Worker(
-        client,
-        task_queue="tic-tac-toe-task-queue",
-        workflows=[GameRoomWorkflow],
-        activities=[validate_move, check_game_state],
+
+    # Connect to Temporal server, with the SDK's metrics exported for this process
+    runtime = temporal_runtime(config.metrics_address)
+    client = await Client.connect(
+        config.address,
+        data_converter=game_data_converter(),
+        interceptors=temporal_interceptors(),
+        runtime=runtime,
     )
-    
-    await worker.run()
+
+    # Run a worker for the workflows and activities of each shard this process polls.
+    # Shards may go past the shard count, to drain the queues of removed shards.
+    shard_map = ShardMap(config.room_shards, config.task_queue)
+    task_queues = [shard_map.queue(shard) for shard in shard_map.parse(config.shards)]
+    logging.info(f"Starting Temporal worker (pid {os.getpid()}) on {', '.join(task_queues)}")
+    interceptor = ActivityMetricsInterceptor((runtime or Runtime.default()).metric_meter)
+    # Each Worker has its own sticky cache, so they share the process's budget
+    max_cached_workflows = max(1, config.max_cached_workflows // len(task_queues))
+    workers = [
+        Worker(
+            client,
+            task_queue=task_queue,
+            workflows=[GameRoomWorkflow, MatchmakerWorkflow],
+            activities=[validate_move, check_game_state, archive_game],
+            interceptors=[interceptor],
+            max_concurrent_workflow_tasks=config.max_concurrent_workflow_tasks,
+            max_concurrent_activities=config.max_concurrent_activities,
+            max_cached_workflows=max_cached_workflows,
+            max_concurrent_workflow_task_polls=config.workflow_task_pollers,
+            max_concurrent_activity_task_polls=config.activity_task_pollers,
+            graceful_shutdown_timeout=timedelta(seconds=config.graceful_shutdown_seconds),
+        )
+        for task_queue in task_queues
+    ]
+
+    # Stop polling on SIGTERM/SIGINT and let in-flight tasks finish
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with contextlib.AsyncExitStack() as stack:
+        for worker in workers:
+            await stack.enter_async_context(worker)
+        await stop.wait()
+        logging.info(f"Shutting down Temporal worker (pid {os.getpid()})")
+        # All shards drain at once instead of one graceful shutdown after the other
+        await asyncio.gather(*(worker.shutdown() for worker in workers))
+
+
+def worker_process(config: WorkerConfig):
+    asyncio.run(run_worker(config))
+
+
+def run_worker_pool(config: WorkerConfig):
+    """
+    Run config.processes workers on the same shards, one per process, so
+    workflow replay is spread over several cores. SIGTERM/SIGINT are passed
+    on to every worker, which shuts down gracefully.
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    # Fresh interpreters, so no event loop or client state is inherited
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=worker_process,
+            args=(replace(config, metrics_address=offset_metrics_address(config.metrics_address, i)),),
+            name=f"worker-{i}",
+        )
+        for i in range(config.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, _frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+
+    for process in processes:
+        process.join()
+    if any(process.exitcode for process in processes):
+        sys.exit(1)
+
+
+def parse_config() -> WorkerConfig:
+    defaults = WorkerConfig()
+    env = os.environ
+    parser = argparse.ArgumentParser(description="Temporal worker for the tic-tac-toe game rooms")
+    parser.add_argument("--address", default=env.get("TEMPORAL_ADDRESS", defaults.address))
+    parser.add_argument("--task-queue", default=env.get("TASK_QUEUE", defaults.task_queue))
+    parser.add_argument("--room-shards", type=int, default=int(env.get("ROOM_SHARDS", defaults.room_shards)))
+    parser.add_argument("--shards", default=env.get("WORKER_SHARDS", defaults.shards),
+                        help='shards to poll, "all" or shards and ranges like "0,2,4-7"')
+    parser.add_argument("--processes", type=int,
+                        default=int(env.get("WORKER_PROCESSES", defaults.processes)))
+    parser.add_argument("--max-concurrent-workflow-tasks", type=int,
+                        default=int(env.get("MAX_CONCURRENT_WORKFLOW_TASKS", defaults.max_concurrent_workflow_tasks)))
+    parser.add_argument("--max-concurrent-activities", type=int,
+                        default=int(env.get("MAX_CONCURRENT_ACTIVITIES", defaults.max_concurrent_activities)))
+    parser.add_argument("--max-cached-workflows", type=int,
+                        default=int(env.get("MAX_CACHED_WORKFLOWS", defaults.max_cached_workflows)),
+                        help="sticky cache size per process, split evenly between the shards it polls")
+    parser.add_argument("--workflow-task-pollers", type=int,
+                        default=int(env.get("WORKFLOW_TASK_POLLERS", defaults.workflow_task_pollers)))
+    parser.add_argument("--activity-task-pollers", type=int,
+                        default=int(env.get("ACTIVITY_TASK_POLLERS", defaults.activity_task_pollers)))
+    parser.add_argument("--graceful-shutdown-seconds", type=float,
+                        default=float(env.get("GRACEFUL_SHUTDOWN_SECONDS", defaults.graceful_shutdown_seconds)))
+    parser.add_argument("--metrics-address", default=env.get("METRICS_ADDRESS", defaults.metrics_address),
+                        help="host:port serving Prometheus metrics, empty to disable")
+    return WorkerConfig(**vars(parser.parse_args()))
 
 
 if __name__ == "__main__":
-    asyncio.run(run_worker()) 
\ No newline at end of file
+    config = parse_config()
+    if config.processes > 1:
+        run_worker_pool(config)
+    else:
+        asyncio.run(run_worker(config))
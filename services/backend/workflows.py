@@ -1,43 +1,96 @@
 import asyncio
 import uuid
-from dataclasses import dataclass
-from datetime import timedelta
-from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
 
 from temporalio import workflow
 from temporalio.common import RetryPolicy
+from temporalio.exceptions import ActivityError, ApplicationError, WorkflowAlreadyStartedError
+from temporalio.workflow import ParentClosePolicy
 
-from activities import Board, CheckGameStateInput, CheckMoveInput, check_game_state, validate_move
+# Shared with the worker process instead of being re-imported by the sandbox for every run.
+# These modules are deterministic and keep no per-workflow module state.
+with workflow.unsafe.imports_passed_through():
+    from activities import archive_game, check_game_state, compute_bot_move, validate_move
+    from models import (
+        BOT_PLAYER_ID,
+        Board,
+        BotMoveInput,
+        CheckGameStateInput,
+        CheckMoveInput,
+        CreateRoomInput,
+        GameRecord,
+        GameState,
+        JoinRoomInput,
+        MatchAssignment,
+        MatchmakerInput,
+        MatchmakerStats,
+        MatchmakingInput,
+        MoveInput,
+    )
+    from sharding import ShardMap
 
+# Patch marker for rooms that evaluate the rules in-workflow. Histories recorded
+# before this patch keep replaying through the rule activities.
+INLINE_RULES_PATCH = "inline-rules"
 
-@dataclass
-class GameState:
-    board: Board
-    players: Dict[str, str]  # player_id -> mark (X or O)
-    current_turn: Optional[str]  # player_id of whose turn it is
-    game_status: str  # "waiting", "active", "finished"
-    winner: Optional[str] = None  # player_id of winner, if any
-    move_deadline: Optional[str] = None  # ISO format string of deadline time
+# Patch marker for rooms that outlive a single game through continue-as-new
+# (best-of-N matches, rematches and history-size control).
+CONTINUE_AS_NEW_PATCH = "continue-as-new-rooms"
 
+# Patch marker for rooms that archive every finished game through the archive_game activity
+ARCHIVE_GAMES_PATCH = "archive-games"
 
-@dataclass
-class CreateRoomInput:
-    creator_id: str
-    room_id: str  # Add room_id to input parameters
+# Patch marker for rooms that run each turn on a single timer, with optional chess clocks
+TURN_CLOCK_PATCH = "turn-clocks"
 
+# Patch marker for rooms that close once nobody has joined within their lobby TTL
+LOBBY_TTL_PATCH = "lobby-ttl"
 
-@dataclass
-class JoinRoomInput:
-    room_id: str
-    player_id: str
+# Patch marker for chess-clock rooms whose bot searches within its bank and loses on time like a player
+BOT_CLOCK_PATCH = "bot-clock"
 
+# Patch marker for a matchmaker that starts each room on the task queue of its shard
+SHARDED_ROOMS_PATCH = "sharded-rooms"
 
-@dataclass
-class MoveInput:
-    room_id: str
-    player_id: str
-    x: int
-    y: int
+# Patch marker for a matchmaker whose enqueue update returns at once, players then poll for their room
+QUICK_ENQUEUE_PATCH = "quick-enqueue"
+
+# ApplicationError types telling wait_for_change callers whether to poll again
+ROOM_CLOSED_ERROR = "RoomClosed"
+ROOM_CONTINUING_ERROR = "RoomContinuing"
+
+# ApplicationError type of a move whose move_id was already applied, the caller can treat it as done
+DUPLICATE_MOVE_ERROR = "DuplicateMove"
+
+# Client move IDs remembered per room for deduplication
+RECENT_MOVE_IDS = 32
+
+# Time per move in rooms without a chess clock
+MOVE_TIMEOUT = timedelta(seconds=30)
+
+# Pause between the games of a match, so players get to see the final board
+NEXT_GAME_DELAY = timedelta(seconds=5)
+
+# How long players have to ask for a rematch once a match is over
+REMATCH_WINDOW = timedelta(seconds=60)
+
+# Bot moves are searched on their own task queue, served by bot_worker.py, so
+# CPU-bound searches never hold up the game rooms' workflow and rule tasks
+BOT_TASK_QUEUE = "tic-tac-toe-bot-task-queue"
+
+# Part of a room's bot move budget left for queueing and delivering the move, the rest is search time
+BOT_MOVE_OVERHEAD = 0.2
+
+# The single matchmaker queue all servers enqueue players on
+MATCHMAKER_WORKFLOW_ID = "tic-tac-toe-matchmaker"
+
+# How long an enqueue update waited for an opponent, in matchmaker runs from before QUICK_ENQUEUE_PATCH
+MATCH_WAIT = timedelta(seconds=20)
+
+# Enqueue updates a matchmaker run accepts before continuing as new, well below Temporal's
+# limit of about 2000 updates per run
+MAX_UPDATES_PER_RUN = 1000
 
 
 @workflow.defn
@@ -53,137 +106,747 @@ class GameRoomWorkflow:
         )
         self._move_queue: asyncio.Queue = asyncio.Queue()
         self._player_joined: asyncio.Event = asyncio.Event()
+        # Counters used by the move update to wait until its own move has been processed
+        self._moves_received: int = 0
+        self._moves_processed: int = 0
+        self._inline_rules: bool = False
+        self._continue_as_new_rooms: bool = False
+        # Set while handing over to a new run / before completing, releases long-poll updates
+        self._continuing: bool = False
+        self._closing: bool = False
+        self._accepting_rematch: bool = False
+        self._archive_games: bool = False
+        self._move_log: List[int] = []  # cells played in this game, for the archive
+        self._timed_out: bool = False
+        self._turn_clocks: bool = False
+        self._clock_ms: int = 0
+        self._increment_ms: int = 0
+        self._lobby_ttl: bool = False
 
     @workflow.run
     async def run(self, input: CreateRoomInput) -> Dict:
         """Creates and manages a game room"""
         self.room_id = input.room_id  # Use the room_id from input rather than generating it
         
-        # Add creator as first player with mark 'X'
-        creator_id = input.creator_id
-        self.state.players[creator_id] = "X"
-        workflow.logger.info(f"Room created: {self.room_id}, creator: {creator_id}")
+        # Rules are pure 3x3 arithmetic, so evaluate them in-workflow unless the room opts out
+        self._inline_rules = input.rules_mode != "activity" and workflow.patched(INLINE_RULES_PATCH)
+        self._continue_as_new_rooms = workflow.patched(CONTINUE_AS_NEW_PATCH)
+        self._archive_games = workflow.patched(ARCHIVE_GAMES_PATCH)
+        self._turn_clocks = workflow.patched(TURN_CLOCK_PATCH)
+        self._lobby_ttl = workflow.patched(LOBBY_TTL_PATCH)
+        if self._turn_clocks:
+            self._clock_ms = input.clock_ms
+            self._increment_ms = input.increment_ms
         
-        # Wait for second player to join
+        if input.resume_state is not None:
+            # Continued because the history grew too long, pick the game up where it was
+            self.state = input.resume_state
+            self._move_log = list(input.move_log or [])
+            if self.state.move_deadline_ms is None and self.state.move_deadline:
+                # Handed over by a run that only kept the ISO deadline
+                self.state.move_deadline_ms = int(datetime.fromisoformat(self.state.move_deadline).timestamp() * 1000)
+            self._player_joined.set()
+            workflow.logger.info(f"Room {self.room_id} resumed in a new run")
+        else:
+            self.state.board = Board.new_board(input.board_size, input.win_length)
+            self.state.best_of = input.best_of
+            self.state.game_number = input.game_number
+            self.state.scores = dict(input.scores or {})
+            self.state.version = input.version
+            self.state.recent_move_ids = list(input.recent_move_ids or [])
+            
+            if input.players:
+                # Next game of a match, both players are already here
+                self.state.players = dict(input.players)
+                self._start_game()
+                workflow.logger.info(f"Room {self.room_id}: game {self.state.game_number} of {self.state.best_of}")
+            elif input.opponent_id or input.vs_bot:
+                # Started by the matchmaker with both players, or against the bot: nobody needs to join
+                self.state.players = {input.creator_id: "X", input.opponent_id or BOT_PLAYER_ID: "O"}
+                self._start_game()
+                workflow.logger.info(f"Room created with both players: {self.room_id}")
+            else:
+                # Add creator as first player with mark 'X'
+                creator_id = input.creator_id
+                self.state.players[creator_id] = "X"
+                workflow.logger.info(f"Room created: {self.room_id}, creator: {creator_id}")
+        
+        # Wait for second player to join, for at most the lobby TTL
         if not self._player_joined.is_set():
-            await self._player_joined.wait()
+            if self._lobby_ttl and input.lobby_ttl_ms:
+                self.state.lobby_deadline_ms = self._now_ms() + input.lobby_ttl_ms
+                try:
+                    await workflow.wait_condition(
+                        self._player_joined.is_set,
+                        timeout=timedelta(milliseconds=input.lobby_ttl_ms),
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                if not self._player_joined.is_set():
+                    self._expire_lobby()
+            else:
+                await self._player_joined.wait()
         
         # The game state (current_turn, game_status, move_deadline) is now set by the join_game signal
         workflow.logger.info(f"Game is now active, {self.state.current_turn}'s turn")
         
         # Main game loop
         while self.state.game_status == "active":
-            try:
-                # Wait for a move with timeout
-                move = await workflow.wait_condition(
-                    lambda: not self._move_queue.empty(),
-                    timeout=30,
-                )
+            if self.state.current_turn == BOT_PLAYER_ID:
+                await self._play_bot_move(input)
+            elif self._turn_clocks:
+                await self._play_turn()
+            else:
+                try:
+                    # Wait for a move with timeout
+                    move = await workflow.wait_condition(
+                        lambda: not self._move_queue.empty(),
+                        timeout=30,
+                    )
                 
-                # Process the move from queue
-                if not self._move_queue.empty():
-                    await self._process_move()
+                    # Process the move from queue
+                    if not self._move_queue.empty():
+                        await self._process_move()
                 
-            except asyncio.TimeoutError:
-                # Player took too long, they lose
-                current_player_id = self.state.current_turn
-                opponent_id = next(pid for pid in self.state.players if pid != current_player_id)
-                self.state.winner = opponent_id
-                self.state.game_status = "finished"
-                workflow.logger.info(f"Player {current_player_id} timed out, {opponent_id} wins")
+                except asyncio.TimeoutError:
+                    self._time_out(self.state.current_turn)
+            
+            # Keep replay time and worker cache memory bounded for long games
+            if self.state.game_status == "active" and self._history_too_long(input) and self._move_queue.empty():
+                await self._continue_as_new(
+                    self._next_input(input, resume_state=self.state, move_log=self._move_log)
+                )
+        
+        if self._archive_games and self.state.game_status == "finished":
+            await self._archive_game()
+        
+        if self._continue_as_new_rooms and self.state.game_status == "finished":
+            next_input = await self._next_game_input(input)
+            if next_input is not None:
+                await self._continue_as_new(next_input)
+        
+        # Let in-flight updates return the final state before completing
+        self._closing = True
+        await workflow.wait_condition(workflow.all_handlers_finished)
         
         # Return final game state
+        if self.state.game_status == "expired":
+            final_result = "expired"
+        else:
+            final_result = "win" if self.state.winner else "draw"
         return {
             "room_id": self.room_id,
             "state": self.state,
-            "final_result": "win" if self.state.winner else "draw"
+            "final_result": final_result
         }
 
+    def _start_game(self) -> None:
+        # X always moves first
+        first_player = next(pid for pid in self.state.players if self.state.players[pid] == "X")
+        if self._clock_ms:
+            self.state.clocks_ms = {pid: self._clock_ms for pid in self.state.players}
+        self._start_turn(first_player)
+        self.state.game_status = "active"
+        self.state.lobby_deadline_ms = None
+        self.state.version += 1
+        self._player_joined.set()
+
+    def _expire_lobby(self) -> None:
+        """Close a room nobody joined within its lobby TTL, so it stops holding a worker cache slot"""
+        self.state.game_status = "expired"
+        self.state.lobby_deadline_ms = None
+        self.state.version += 1
+        workflow.logger.info(f"Room {self.room_id} expired, nobody joined")
+
+    def _now_ms(self) -> int:
+        return int(workflow.now().timestamp() * 1000)
+
+    def _start_turn(self, player_id: str) -> None:
+        """Give the move to player_id, with the rest of their bank or a fixed time to make it"""
+        self.state.current_turn = player_id
+        if player_id in self.state.clocks_ms:
+            time_left = timedelta(milliseconds=self.state.clocks_ms[player_id])
+        else:
+            time_left = MOVE_TIMEOUT
+        deadline = workflow.now() + time_left
+        self.state.move_deadline = deadline.isoformat()
+        self.state.move_deadline_ms = int(deadline.timestamp() * 1000)
+
+    def _stop_clock(self, player_id: str) -> None:
+        """Bank what is left of player_id's time after their move, plus the increment"""
+        if player_id in self.state.clocks_ms and self.state.move_deadline_ms is not None:
+            time_left = max(0, self.state.move_deadline_ms - self._now_ms())
+            self.state.clocks_ms[player_id] = time_left + self._increment_ms
+
+    def _time_out(self, player_id: str) -> None:
+        # Player took too long, they lose
+        opponent_id = next(pid for pid in self.state.players if pid != player_id)
+        if player_id in self.state.clocks_ms:
+            self.state.clocks_ms[player_id] = 0
+        self.state.winner = opponent_id
+        self.state.game_status = "finished"
+        self.state.version += 1
+        self._timed_out = True
+        workflow.logger.info(f"Player {player_id} timed out, {opponent_id} wins")
+
+    async def _play_turn(self) -> None:
+        """
+        Process moves until the turn passes or the player runs out of time.
+        The whole turn runs on one timer, started here and cancelled once the
+        turn is over, so moves that are rejected do not restart the clock.
+        """
+        player_id = self.state.current_turn
+        time_left = self.state.move_deadline_ms - self._now_ms()
+        if time_left <= 0:
+            self._time_out(player_id)
+            return
+        timer = asyncio.create_task(workflow.sleep(timedelta(milliseconds=time_left)))
+        try:
+            while self.state.game_status == "active" and self.state.current_turn == player_id:
+                await workflow.wait_condition(lambda: not self._move_queue.empty() or timer.done())
+                if not self._move_queue.empty():
+                    await self._process_move()
+                else:
+                    self._time_out(player_id)
+        finally:
+            timer.cancel()
+
+    async def _archive_game(self) -> None:
+        if self._timed_out:
+            result = "timeout"
+        else:
+            result = "win" if self.state.winner else "draw"
+        record = GameRecord(
+            game_id=workflow.info().run_id,  # each run finishes at most one game
+            room_id=self.room_id,
+            game_number=self.state.game_number,
+            best_of=self.state.best_of,
+            board_size=self.state.board.size,
+            win_length=self.state.board.win_length,
+            players=dict(self.state.players),
+            moves=self._move_log,
+            winner=self.state.winner,
+            result=result,
+            finished_at=int(workflow.now().timestamp() * 1000),
+        )
+        try:
+            await workflow.execute_activity(
+                archive_game,
+                record,
+                start_to_close_timeout=timedelta(seconds=10),
+                retry_policy=RetryPolicy(maximum_attempts=5),
+            )
+        except ActivityError as e:
+            # Losing an archive record must not take the room down with it
+            workflow.logger.warning(f"Failed to archive game in room {self.room_id}: {e}")
+
+    def _history_too_long(self, input: CreateRoomInput) -> bool:
+        info = workflow.info()
+        return (
+            self._continue_as_new_rooms
+            and (info.is_continue_as_new_suggested() or info.get_current_history_length() >= input.max_history_events)
+        )
+
+    def _match_decided(self) -> bool:
+        wins_needed = self.state.best_of // 2 + 1
+        return (
+            self.state.game_number >= self.state.best_of
+            or any(wins >= wins_needed for wins in self.state.scores.values())
+        )
+
+    async def _next_game_input(self, input: CreateRoomInput) -> Optional[CreateRoomInput]:
+        """Input for the room's next run, or None if the room is done"""
+        if self.state.winner:
+            self.state.scores[self.state.winner] = self.state.scores.get(self.state.winner, 0) + 1
+            self.state.version += 1
+        
+        # Swap marks so the other player starts the next game
+        swapped = {pid: "O" if mark == "X" else "X" for pid, mark in self.state.players.items()}
+        
+        if not self._match_decided():
+            await workflow.sleep(NEXT_GAME_DELAY)
+            return self._next_input(
+                input,
+                players=swapped,
+                scores=self.state.scores,
+                game_number=self.state.game_number + 1,
+            )
+        
+        # Match over, both players have REMATCH_WINDOW to ask for another one
+        if BOT_PLAYER_ID in self.state.players:
+            # The bot is always up for another match
+            self.state.rematch_requests.append(BOT_PLAYER_ID)
+            self.state.version += 1
+        self._accepting_rematch = True
+        try:
+            await workflow.wait_condition(
+                lambda: len(self.state.rematch_requests) == len(self.state.players),
+                timeout=REMATCH_WINDOW,
+            )
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._accepting_rematch = False
+        return self._next_input(input, players=swapped, scores={}, game_number=1)
+
+    def _next_input(self, input: CreateRoomInput, **carried) -> CreateRoomInput:
+        """Input for the next run: the room settings plus only what needs carrying over"""
+        return CreateRoomInput(
+            creator_id=input.creator_id,
+            room_id=self.room_id,
+            rules_mode=input.rules_mode,
+            board_size=input.board_size,
+            win_length=input.win_length,
+            best_of=input.best_of,
+            max_history_events=input.max_history_events,
+            version=self.state.version,
+            vs_bot=input.vs_bot,
+            bot_move_budget_ms=input.bot_move_budget_ms,
+            clock_ms=input.clock_ms,
+            increment_ms=input.increment_ms,
+            recent_move_ids=self.state.recent_move_ids,
+            lobby_ttl_ms=input.lobby_ttl_ms,
+            **carried,
+        )
+
+    async def _continue_as_new(self, next_input: CreateRoomInput) -> None:
+        # New moves are rejected from here on, pending updates return before the hand-over
+        self._continuing = True
+        await workflow.wait_condition(workflow.all_handlers_finished)
+        workflow.continue_as_new(next_input)
+
+    async def _play_bot_move(self, input: CreateRoomInput) -> None:
+        """Let the bot search its move within the room's budget, and its bank in chess-clock rooms, and play it"""
+        budget_ms = input.bot_move_budget_ms
+        on_clock = BOT_PLAYER_ID in self.state.clocks_ms and workflow.patched(BOT_CLOCK_PATCH)
+        if on_clock:
+            bank_ms = self.state.move_deadline_ms - self._now_ms()
+            if bank_ms <= 0:
+                self._time_out(BOT_PLAYER_ID)
+                return
+            budget_ms = min(budget_ms, bank_ms)
+        budget = timedelta(milliseconds=budget_ms)
+        mark = self.state.players[BOT_PLAYER_ID]
+        try:
+            move = await workflow.execute_activity(
+                compute_bot_move,
+                BotMoveInput(
+                    board=self.state.board,
+                    mark=mark,
+                    budget_ms=int(budget_ms * (1 - BOT_MOVE_OVERHEAD)),
+                ),
+                task_queue=BOT_TASK_QUEUE,
+                # Covers queueing and the retry too: a bot move never takes longer than the budget
+                schedule_to_close_timeout=budget,
+                start_to_close_timeout=budget,
+                retry_policy=RetryPolicy(maximum_attempts=2),
+            )
+            x, y = move.x, move.y
+        except ActivityError as e:
+            if on_clock and self._now_ms() >= self.state.move_deadline_ms:
+                # The bank ran out before the move arrived, the bot loses on time like a player would
+                self._time_out(BOT_PLAYER_ID)
+                return
+            # Out of time or no bot worker: play the most central free cell rather than forfeit
+            workflow.logger.warning(f"Bot move failed in room {self.room_id}, playing a fallback move: {e}")
+            board = self.state.board
+            center = (board.size - 1) / 2
+            x, y = min(
+                ((x, y) for y in range(board.size) for x in range(board.size) if board.is_valid_move(x, y)),
+                key=lambda cell: abs(cell[0] - center) + abs(cell[1] - center),
+            )
+        if on_clock and self._now_ms() > self.state.move_deadline_ms:
+            self._time_out(BOT_PLAYER_ID)
+            return
+        await self._apply_move(MoveInput(room_id=self.room_id, player_id=BOT_PLAYER_ID, x=x, y=y))
+
     async def _process_move(self) -> None:
         move: MoveInput = await self._move_queue.get()
+        try:
+            await self._apply_move(move)
+        finally:
+            self._moves_processed += 1
+
+    async def _apply_move(self, move: MoveInput) -> None:
         player_id = move.player_id
         x, y = move.x, move.y
         
+        if move.move_id is not None and move.move_id in self.state.recent_move_ids:
+            workflow.logger.info(f"Duplicate move {move.move_id} by {player_id} ignored")
+            return
+        
         # Check if it's this player's turn
         if player_id != self.state.current_turn:
             workflow.logger.info(f"Invalid move: not player's turn. Player: {player_id}")
             return
         
+        mark = self.state.players[player_id]
+        
+        if not await self._is_valid_move(mark, x, y):
+            workflow.logger.info(f"Invalid move: {x},{y} by {player_id}")
+            return
+            
+        self._stop_clock(player_id)
+        if move.move_id is not None:
+            self.state.recent_move_ids.append(move.move_id)
+            del self.state.recent_move_ids[:-RECENT_MOVE_IDS]
+        
+        # Update board
+        self.state.board.place(x, y, mark)
+        self._move_log.append(y * self.state.board.size + x)
+        
+        game_state = await self._check_game_state(mark, x, y)
+        
+        # Update game state based on result
+        if game_state == "win":
+            self.state.game_status = "finished"
+            self.state.winner = player_id
+            workflow.logger.info(f"Player {player_id} wins!")
+        elif game_state == "draw":
+            self.state.game_status = "finished"
+            workflow.logger.info("Game ended in a draw")
+        else:
+            # Switch turns
+            other_player = next(pid for pid in self.state.players if pid != player_id)
+            self._start_turn(other_player)
+            workflow.logger.info(f"Turn changed to {other_player}")
+        
+        self.state.version += 1
+
+    async def _is_valid_move(self, mark: str, x: int, y: int) -> bool:
+        if self._inline_rules:
+            return self.state.board.is_valid_move(x, y)
+        
         # Validate move with activity
-        is_valid = await workflow.execute_activity(
+        return await workflow.execute_activity(
             validate_move,
             CheckMoveInput(
                 board=self.state.board,
-                player=self.state.players[player_id],
+                player=mark,
                 x=x, 
                 y=y
             ),
             start_to_close_timeout=timedelta(seconds=5),
             retry_policy=RetryPolicy(maximum_attempts=3),
         )
-        
-        if not is_valid:
-            workflow.logger.info(f"Invalid move: {x},{y} by {player_id}")
-            return
-            
-        # Update board
-        self.state.board.grid[y][x] = self.state.players[player_id]
+
+    async def _check_game_state(self, mark: str, x: int, y: int) -> str:
+        if self._inline_rules:
+            return self.state.board.check_game_state(x, y, mark)
         
         # Check game state with activity
-        game_state = await workflow.execute_activity(
+        return await workflow.execute_activity(
             check_game_state,
             CheckGameStateInput(
                 board=self.state.board,
                 last_move_x=x,
                 last_move_y=y,
-                last_move_player=self.state.players[player_id]
+                last_move_player=mark
             ),
             start_to_close_timeout=timedelta(seconds=5),
             retry_policy=RetryPolicy(maximum_attempts=3),
         )
-        
-        # Update game state based on result
-        if game_state == "win":
-            self.state.game_status = "finished"
-            self.state.winner = player_id
-            workflow.logger.info(f"Player {player_id} wins!")
-        elif game_state == "draw":
-            self.state.game_status = "finished"
-            workflow.logger.info("Game ended in a draw")
-        else:
-            # Switch turns
-            other_player = next(pid for pid in self.state.players if pid != player_id)
-            self.state.current_turn = other_player
-            deadline_time = workflow.now() + timedelta(seconds=30)
-            self.state.move_deadline = deadline_time.isoformat()  # 30 second deadline
-            workflow.logger.info(f"Turn changed to {other_player}")
 
-    @workflow.signal
-    async def join_game(self, input: JoinRoomInput) -> None:
-        """Signal to join a game room"""
-        if len(self.state.players) >= 2 or input.player_id in self.state.players:
-            workflow.logger.info(f"Join rejected: room full or player already joined. Player: {input.player_id}")
+    def _add_player(self, player_id: str) -> None:
+        if self.state.game_status == "expired":
+            workflow.logger.info(f"Join rejected: room expired. Player: {player_id}")
+            return
+        if len(self.state.players) >= 2 or player_id in self.state.players:
+            workflow.logger.info(f"Join rejected: room full or player already joined. Player: {player_id}")
             return
             
-        self.state.players[input.player_id] = "O"  # Second player is O
-        workflow.logger.info(f"Player {input.player_id} joined room {self.room_id}")
+        self.state.players[player_id] = "O"  # Second player is O
+        workflow.logger.info(f"Player {player_id} joined room {self.room_id}")
         
         # Immediately update game state to active and set the first player's turn
-        creator_id = next(pid for pid in self.state.players if self.state.players[pid] == "X")
-        self.state.current_turn = creator_id
-        self.state.game_status = "active"
-        deadline_time = workflow.now() + timedelta(seconds=30)
-        self.state.move_deadline = deadline_time.isoformat()
-        
-        # Signal that player has joined
-        self._player_joined.set()
+        self._start_game()
+
+    async def _enqueue_move(self, move: MoveInput) -> int:
+        self._moves_received += 1
+        await self._move_queue.put(move)
+        return self._moves_received
+
+    @workflow.signal
+    async def join_game(self, input: JoinRoomInput) -> None:
+        """Signal to join a game room"""
+        self._add_player(input.player_id)
 
     @workflow.signal
     async def make_move(self, input: MoveInput) -> None:
         """Signal to make a move in the game"""
-        await self._move_queue.put(input)
+        await self._enqueue_move(input)
+
+    @workflow.update
+    async def join(self, input: JoinRoomInput) -> GameState:
+        """Update to join a game room, returns the state after the join"""
+        self._add_player(input.player_id)
+        return self.state
+
+    @join.validator
+    def validate_join_update(self, input: JoinRoomInput) -> None:
+        # Re-joining is allowed so a reconnecting player gets the current state back
+        if input.player_id in self.state.players:
+            return
+        if self.state.game_status == "expired":
+            raise ApplicationError("Room expired, nobody joined in time")
+        if len(self.state.players) >= 2:
+            raise ApplicationError("Room is full")
+
+    @workflow.update
+    async def move(self, input: MoveInput) -> GameState:
+        """Update to make a move, returns the state once the move has been processed"""
+        ticket = await self._enqueue_move(input)
+        await workflow.wait_condition(
+            lambda: self._moves_processed >= ticket or self.state.game_status == "finished"
+        )
+        return self.state
+
+    @move.validator
+    def validate_move_update(self, input: MoveInput) -> None:
+        # Rejected updates are never written to history
+        if input.move_id is not None and input.move_id in self.state.recent_move_ids:
+            raise ApplicationError(f"Move {input.move_id} was already applied", type=DUPLICATE_MOVE_ERROR)
+        if self._continuing:
+            raise ApplicationError("Room is moving to a new run, retry the move")
+        if self.state.game_status != "active":
+            raise ApplicationError(f"Game is not active: {self.state.game_status}")
+        if input.player_id not in self.state.players:
+            raise ApplicationError(f"Unknown player: {input.player_id}")
+        if input.player_id != self.state.current_turn:
+            raise ApplicationError("Not your turn")
+        if self._turn_clocks and self.state.move_deadline_ms and self._now_ms() > self.state.move_deadline_ms:
+            raise ApplicationError("Out of time")
+        if not self.state.board.is_valid_move(input.x, input.y):
+            raise ApplicationError(f"Invalid move: {input.x},{input.y}")
+
+    @workflow.update
+    async def wait_for_change(self, after_version: int) -> GameState:
+        """Long-poll update that returns the state once its version is past after_version"""
+        # Also returns when this run hands over or completes, callers then poll the next run
+        await workflow.wait_condition(
+            lambda: self.state.version > after_version or self._continuing or self._closing
+        )
+        return self.state
+
+    @wait_for_change.validator
+    def validate_wait_for_change(self, after_version: int) -> None:
+        if after_version >= self.state.version:
+            # Nothing newer will ever come once the room is closing
+            if self._closing:
+                raise ApplicationError("Room is closed", type=ROOM_CLOSED_ERROR)
+            # Newer states will come from the next run
+            if self._continuing:
+                raise ApplicationError("Room is moving to a new run", type=ROOM_CONTINUING_ERROR)
+
+    @workflow.update
+    async def request_rematch(self, input: JoinRoomInput) -> GameState:
+        """Update to ask for another match once the current one is over"""
+        if input.player_id not in self.state.rematch_requests:
+            self.state.rematch_requests.append(input.player_id)
+            self.state.version += 1
+        return self.state
+
+    @request_rematch.validator
+    def validate_request_rematch(self, input: JoinRoomInput) -> None:
+        if input.player_id not in self.state.players:
+            raise ApplicationError(f"Unknown player: {input.player_id}")
+        if not self._accepting_rematch:
+            raise ApplicationError("No rematch possible right now")
 
     @workflow.query
     def get_state(self) -> GameState:
         """Query the current game state"""
-        return self.state 
\ No newline at end of file
+        return self.state 
+
+
+def queue_key(input: MatchmakingInput) -> str:
+    """Players are only paired with players who want the same kind of room"""
+    return f"{input.board_size}x{input.win_length}:bo{input.best_of}"
+
+
+@workflow.defn
+class MatchmakerWorkflow:
+    """
+    Queues players looking for a game and pairs them in batches. Every update
+    delivered in the same workflow task joins the same batch, and each pair
+    gets a GameRoomWorkflow started as an abandoned child with both players.
+    Enqueueing only acknowledges the player, who then polls the assignment
+    query for their room, so no update stays in flight while players wait.
+    """
+
+    def __init__(self) -> None:
+        self._queues: Dict[str, List[MatchmakingInput]] = {}
+        self._queued: Dict[str, str] = {}  # player_id -> queue key
+        self._assignments: Dict[str, str] = {}  # player_id -> room_id
+        self._stale_assignments: Set[str] = set()  # carried over from the previous run
+        self._matches_started: int = 0
+        self._continuing: bool = False
+        self._shard_rooms: bool = False
+        self._updates: int = 0  # enqueue updates accepted by this run
+
+    @workflow.run
+    async def run(self, input: MatchmakerInput) -> None:
+        self._shard_rooms = workflow.patched(SHARDED_ROOMS_PATCH)
+        self._quick_enqueue()
+        self._queues = input.queues
+        self._queued = {p.player_id: key for key, queue in self._queues.items() for p in queue}
+        self._assignments = input.assignments
+        self._stale_assignments = set(input.assignments)
+        self._matches_started = input.matches_started
+
+        while True:
+            await workflow.wait_condition(lambda: self._has_pairs() or self._history_too_long(input))
+            if self._has_pairs():
+                await self._start_rooms()
+            if self._history_too_long(input):
+                break
+
+        # Pending enqueue updates return "queued" and their players carry over to the next run
+        self._continuing = True
+        await workflow.wait_condition(workflow.all_handlers_finished)
+        workflow.continue_as_new(MatchmakerInput(
+            queues=self._queues,
+            # Assignments nobody picked up during a whole run are dropped
+            assignments={p: r for p, r in self._assignments.items() if p not in self._stale_assignments},
+            matches_started=self._matches_started,
+            max_history_events=input.max_history_events,
+        ))
+
+    def _has_pairs(self) -> bool:
+        return any(len(queue) >= 2 for queue in self._queues.values())
+
+    def _history_too_long(self, input: MatchmakerInput) -> bool:
+        info = workflow.info()
+        return (
+            info.is_continue_as_new_suggested()
+            or info.get_current_history_length() >= input.max_history_events
+            or self._updates >= MAX_UPDATES_PER_RUN
+        )
+
+    def _quick_enqueue(self) -> bool:
+        # Also checked by enqueue, which can run before run() in the first workflow task
+        return workflow.patched(QUICK_ENQUEUE_PATCH)
+
+    def _assignment(self, player_id: str) -> MatchAssignment:
+        room_id = self._assignments.get(player_id)
+        if room_id:
+            return MatchAssignment(player_id=player_id, status="matched", room_id=room_id)
+        key = self._queued.get(player_id)
+        if key is None:
+            return MatchAssignment(player_id=player_id, status="not_queued")
+        queue = self._queues[key]
+        return MatchAssignment(
+            player_id=player_id,
+            status="queued",
+            queue_depth=len(queue),
+            queue_position=next(i for i, p in enumerate(queue, 1) if p.player_id == player_id),
+        )
+
+    async def _start_rooms(self) -> None:
+        pairs = []
+        for key, queue in self._queues.items():
+            paired = len(queue) // 2 * 2
+            pairs.extend(zip(queue[0:paired:2], queue[1:paired:2]))
+            self._queues[key] = queue[paired:]
+        for first, second in pairs:
+            self._queued.pop(first.player_id, None)
+            self._queued.pop(second.player_id, None)
+
+        # All child starts go out in one workflow task
+        await asyncio.gather(*(self._start_room(first, second) for first, second in pairs))
+
+    async def _start_room(self, first: MatchmakingInput, second: MatchmakingInput) -> None:
+        room_id = str(workflow.uuid4())[:8]
+        task_queue = None  # the matchmaker's own queue, shard 0
+        if self._shard_rooms:
+            task_queue = ShardMap(first.room_shards, workflow.info().task_queue).room_queue(room_id)
+        try:
+            await workflow.start_child_workflow(
+                GameRoomWorkflow.run,
+                CreateRoomInput(
+                    creator_id=first.player_id,
+                    room_id=room_id,
+                    board_size=first.board_size,
+                    win_length=first.win_length,
+                    best_of=first.best_of,
+                    opponent_id=second.player_id,
+                ),
+                id=f"tic-tac-toe-{room_id}",
+                task_queue=task_queue,
+                # Rooms outlive the matchmaker's run
+                parent_close_policy=ParentClosePolicy.ABANDON,
+            )
+        except WorkflowAlreadyStartedError:
+            # Room ID taken, pair them again in the next batch
+            key = queue_key(first)
+            self._queues[key] = [first, second] + self._queues.get(key, [])
+            self._queued[first.player_id] = key
+            self._queued[second.player_id] = key
+            return
+        self._assignments[first.player_id] = room_id
+        self._assignments[second.player_id] = room_id
+        self._matches_started += 1
+
+    @workflow.update
+    async def enqueue(self, input: MatchmakingInput) -> MatchAssignment:
+        """
+        Queue a player, returns their room if already matched or else their queue
+        position. Safe to repeat: a matched player keeps getting the same room
+        until they pick it up through the assignment poll, or leave.
+        """
+        player_id = input.player_id
+        if player_id not in self._assignments and player_id not in self._queued:
+            key = queue_key(input)
+            self._queues.setdefault(key, []).append(input)
+            self._queued[player_id] = key
+
+        if self._quick_enqueue():
+            self._updates += 1
+            return self._assignment(player_id)
+
+        # Runs from before QUICK_ENQUEUE_PATCH wait up to MATCH_WAIT for a room and hand it out once
+        try:
+            await workflow.wait_condition(
+                lambda: player_id in self._assignments or self._continuing,
+                timeout=MATCH_WAIT,
+            )
+        except asyncio.TimeoutError:
+            pass
+
+        room_id = self._assignments.pop(player_id, None)
+        if room_id:
+            return MatchAssignment(player_id=player_id, status="matched", room_id=room_id)
+        key = self._queued.get(player_id)
+        return MatchAssignment(
+            player_id=player_id,
+            status="queued",
+            queue_depth=len(self._queues.get(key, [])) if key else 0,
+        )
+
+    @enqueue.validator
+    def validate_enqueue(self, input: MatchmakingInput) -> None:
+        if not input.player_id:
+            raise ApplicationError("player_id is required")
+
+    @workflow.signal
+    async def leave(self, player_id: str) -> None:
+        """Signal to take a player out of the queue, or to drop their room assignment once picked up"""
+        key = self._queued.pop(player_id, None)
+        if key:
+            self._queues[key] = [p for p in self._queues[key] if p.player_id != player_id]
+        self._assignments.pop(player_id, None)
+
+    @workflow.query
+    def assignment(self, player_id: str) -> MatchAssignment:
+        """Query for a player's room once matched, otherwise their place in the queue"""
+        return self._assignment(player_id)
+
+    @workflow.query
+    def stats(self) -> MatchmakerStats:
+        """Query for the queue depth per kind of room"""
+        depth = {key: len(queue) for key, queue in self._queues.items() if queue}
+        return MatchmakerStats(
+            queue_depth=depth,
+            waiting=sum(depth.values()),
+            matches_started=self._matches_started,
+        )
@@ -9,10 +9,20 @@ const gameState = {
   currentTurn: null,
   gameStatus: "waiting",
   winner: null,
-  moveDeadline: null,
+  moveDeadlineMs: null, // epoch milliseconds
   timerInterval: null,
+  version: -1,
+  spectating: false,
+  bestOf: 1,
+  gameNumber: 1,
+  scores: {},
+  rematchRequests: [],
+  moveInFlight: false, // a move was sent and its result has not arrived yet
 };
 
+// Network failures of a move are retried with the same move ID, so the server applies it once
+const MOVE_RETRIES = 2;
+
 // Backend API URL
 const API_URL = "http://localhost:8000";
 
@@ -21,7 +31,9 @@ const lobbyView = document.getElementById("lobby-view");
 const gameView = document.getElementById("game-view");
 const createRoomBtn = document.getElementById("create-room-btn");
 const joinRoomBtn = document.getElementById("join-room-btn");
+const watchRoomBtn = document.getElementById("watch-room-btn");
 const autoMatchBtn = document.getElementById("auto-match-btn");
+const botMatchBtn = document.getElementById("bot-match-btn");
 const roomIdInput = document.getElementById("room-id-input");
 const lobbyMessage = document.getElementById("lobby-message");
 const roomIdDisplay = document.getElementById("room-id-display");
@@ -32,8 +44,11 @@ const playerMark = document.getElementById("player-mark");
 const timer = document.getElementById("timer");
 const timeLeft = document.getElementById("time-left");
 const newGameBtn = document.getElementById("new-game-btn");
+const matchScore = document.getElementById("match-score");
 const backToLobbyBtn = document.getElementById("back-to-lobby-btn");
-const boardCells = document.querySelectorAll(".board-cell");
+const boardSizeSelect = document.getElementById("board-size-select");
+const openRoomsList = document.getElementById("open-rooms-list");
+let boardCells = document.querySelectorAll(".board-cell");
 
 // WebSocket connection
 let socket = null;
@@ -41,12 +56,14 @@ let socket = null;
 // Initialize the game
 function init() {
   // Attach event listeners
-  createRoomBtn.addEventListener("click", createRoom);
+  createRoomBtn.addEventListener("click", () => createRoom(false));
+  botMatchBtn.addEventListener("click", () => createRoom(true));
   joinRoomBtn.addEventListener("click", joinRoom);
+  watchRoomBtn.addEventListener("click", spectateRoom);
   autoMatchBtn.addEventListener("click", findQuickMatch);
   copyRoomIdBtn.addEventListener("click", copyRoomId);
   backToLobbyBtn.addEventListener("click", goToLobby);
-  newGameBtn.addEventListener("click", createRoom);
+  newGameBtn.addEventListener("click", playAgain);
 
   // Fix for input field focus issues
   roomIdInput.addEventListener("focus", function (e) {
@@ -63,93 +80,152 @@ function init() {
     }
   });
 
-  // Add click listeners to board cells
-  boardCells.forEach((cell) => {
-    cell.addEventListener("click", () => {
-      const x = parseInt(cell.getAttribute("data-x"));
-      const y = parseInt(cell.getAttribute("data-y"));
-      makeMove(x, y);
-    });
+  // Add listeners to the initial board cells
+  boardCells.forEach(attachCellListeners);
+
+  // Keep the list of rooms waiting for a second player fresh while in the lobby
+  refreshOpenRooms();
+  setInterval(() => {
+    if (!lobbyView.classList.contains("hidden")) {
+      refreshOpenRooms();
+    }
+  }, 5000);
+}
+
+// List rooms waiting for a second player, from the server's room index in one call
+function refreshOpenRooms() {
+  fetch(`${API_URL}/rooms?status=waiting&limit=20`)
+    .then((response) => response.json())
+    .then((data) => {
+      openRoomsList.innerHTML = "";
+      if (!data.rooms.length) {
+        const empty = document.createElement("li");
+        empty.className = "open-rooms-empty";
+        empty.textContent = "No open rooms, create one!";
+        openRoomsList.appendChild(empty);
+        return;
+      }
+      data.rooms.forEach((room) => {
+        const item = document.createElement("li");
+        const label = document.createElement("span");
+        label.textContent = `${room.room_id} · ${room.board_size}×${room.board_size}, ${room.win_length} in a row`;
+        const joinBtn = document.createElement("button");
+        joinBtn.className = "btn-small";
+        joinBtn.textContent = "Join";
+        joinBtn.addEventListener("click", () => {
+          roomIdInput.value = room.room_id;
+          joinRoom();
+        });
+        item.appendChild(label);
+        item.appendChild(joinBtn);
+        openRoomsList.appendChild(item);
+      });
+    })
+    .catch((error) => console.error("Error listing rooms:", error));
+}
+
+// Attach click and hover listeners to a board cell
+function attachCellListeners(cell) {
+  cell.addEventListener("click", () => {
+    const x = parseInt(cell.getAttribute("data-x"));
+    const y = parseInt(cell.getAttribute("data-y"));
+    makeMove(x, y);
   });
 
   // Add hover effects to cells for better UX
-  boardCells.forEach((cell) => {
-    cell.addEventListener("mouseenter", () => {
-      if (
-        gameState.gameStatus === "active" &&
-        gameState.currentTurn === gameState.playerId &&
-        !cell.classList.contains("x") &&
-        !cell.classList.contains("o")
-      ) {
-        cell.style.opacity = "0.8";
-        if (gameState.playerMark === "X") {
-          cell.style.backgroundColor = "rgba(231, 76, 60, 0.2)";
-        } else {
-          cell.style.backgroundColor = "rgba(52, 152, 219, 0.2)";
-        }
+  cell.addEventListener("mouseenter", () => {
+    if (
+      gameState.gameStatus === "active" &&
+      gameState.currentTurn === gameState.playerId &&
+      !cell.classList.contains("x") &&
+      !cell.classList.contains("o")
+    ) {
+      cell.style.opacity = "0.8";
+      if (gameState.playerMark === "X") {
+        cell.style.backgroundColor = "rgba(231, 76, 60, 0.2)";
+      } else {
+        cell.style.backgroundColor = "rgba(52, 152, 219, 0.2)";
       }
-    });
+    }
+  });
 
-    cell.addEventListener("mouseleave", () => {
-      cell.style.opacity = "1";
-      if (
-        !cell.classList.contains("x") &&
-        !cell.classList.contains("o") &&
-        !cell.classList.contains("highlight")
-      ) {
-        cell.style.backgroundColor = "";
-      }
-    });
+  cell.addEventListener("mouseleave", () => {
+    cell.style.opacity = "1";
+    if (
+      !cell.classList.contains("x") &&
+      !cell.classList.contains("o") &&
+      !cell.classList.contains("highlight")
+    ) {
+      cell.style.backgroundColor = "";
+    }
   });
 }
 
-// Function to ensure state is in sync with server
-function forceSyncGameState() {
-  if (!gameState.roomId) return;
+// Rebuild the board cells when the room uses a different board size
+function renderBoard(size) {
+  if (boardCells.length === size * size) return;
+
+  gameBoard.innerHTML = "";
+  for (let y = 0; y < size; y++) {
+    const row = document.createElement("div");
+    row.className = "board-row";
+    for (let x = 0; x < size; x++) {
+      const cell = document.createElement("div");
+      cell.className = "board-cell";
+      cell.setAttribute("data-x", x);
+      cell.setAttribute("data-y", y);
+      attachCellListeners(cell);
+      row.appendChild(cell);
+    }
+    gameBoard.appendChild(row);
+  }
 
-  // Fetch current state directly using REST API (more reliable than WebSocket)
-  fetch(`${API_URL}/rooms/${gameState.roomId}/state`)
-    .then((response) => response.json())
-    .then((data) => {
-      console.log("Forced state sync:", data.state);
-      updateGameState(data.state);
-      updateUI();
-    })
-    .catch((error) => {
-      console.error("Error syncing state:", error);
-    });
+  // Keep large boards roughly the same overall size as the 3x3 board
+  gameBoard.style.setProperty("--board-size", size);
+  gameBoard.style.setProperty("--cell-size", `${Math.max(24, Math.floor(300 / size))}px`);
+  boardCells = gameBoard.querySelectorAll(".board-cell");
 }
 
 // Create a new room
-function createRoom() {
+function createRoom(vsBot) {
   // Show loading state
-  createRoomBtn.innerHTML =
-    '<i class="fas fa-spinner fa-spin"></i> Creating...';
-  createRoomBtn.disabled = true;
+  const button = vsBot ? botMatchBtn : createRoomBtn;
+  const label = button.innerHTML;
+  button.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Creating...';
+  button.disabled = true;
 
   // Generate random playerId if not exists
   if (!gameState.playerId) {
     gameState.playerId = generatePlayerId();
   }
 
+  // Board size and win length, e.g. "15:5" for Gomoku-style rooms
+  const [boardSize, winLength] = boardSizeSelect.value.split(":").map(Number);
+
   // Attempt to create a room using the API
   fetch(`${API_URL}/rooms`, {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
     },
-    body: JSON.stringify({ player_id: gameState.playerId }),
+    body: JSON.stringify({
+      player_id: gameState.playerId,
+      board_size: boardSize,
+      win_length: winLength,
+      vs_bot: vsBot,
+    }),
   })
     .then((response) => response.json())
     .then((data) => {
       // Reset button state
-      createRoomBtn.innerHTML =
-        '<i class="fas fa-plus-circle"></i> Create New Room';
-      createRoomBtn.disabled = false;
+      button.innerHTML = label;
+      button.disabled = false;
 
       // Update game state
       gameState.roomId = data.room_id;
       gameState.playerId = data.player_id;
+      gameState.version = -1;
+      updateGameState(data.state);
 
       // Connect to WebSocket for real-time updates
       connectToWebSocket(gameState.roomId);
@@ -157,24 +233,11 @@ function createRoom() {
       // Show game view
       showGameView();
       updateUI();
-
-      // Set up periodic state syncs to catch any player joins
-      const syncInterval = setInterval(() => {
-        if (gameState.gameStatus === "active") {
-          clearInterval(syncInterval);
-        } else {
-          forceSyncGameState();
-        }
-      }, 2000);
-
-      // Auto-clear after 30 seconds in any case
-      setTimeout(() => clearInterval(syncInterval), 30000);
     })
     .catch((error) => {
       console.error("Error creating room:", error);
-      createRoomBtn.innerHTML =
-        '<i class="fas fa-plus-circle"></i> Create New Room';
-      createRoomBtn.disabled = false;
+      button.innerHTML = label;
+      button.disabled = false;
       lobbyMessage.textContent = "Failed to create room. Please try again.";
 
       // Add animation to error message
@@ -236,6 +299,7 @@ function joinRoom() {
       // Update game state
       gameState.roomId = data.room_id;
       gameState.playerId = data.player_id;
+      gameState.version = -1;
 
       // Get initial state from response
       console.log("Initial state after joining:", data.state);
@@ -247,11 +311,6 @@ function joinRoom() {
       // Show game view
       showGameView();
       updateUI();
-
-      // Multiple sync attempts to ensure we get correct state
-      setTimeout(forceSyncGameState, 500);
-      setTimeout(forceSyncGameState, 1500);
-      setTimeout(forceSyncGameState, 3000);
     })
     .catch((error) => {
       console.error("Error joining room:", error);
@@ -275,16 +334,98 @@ function joinRoom() {
     });
 }
 
-// Find a quick match (auto-join any available room or create one)
+// Watch a room as a spectator, without taking a player slot
+function spectateRoom() {
+  const roomIdToWatch = roomIdInput.value.trim();
+
+  if (!roomIdToWatch) {
+    lobbyMessage.textContent = "Please enter a valid Room ID";
+    return;
+  }
+
+  gameState.roomId = roomIdToWatch;
+  gameState.spectating = true;
+  gameState.version = -1;
+
+  // The server sends a snapshot on connect, followed by deltas
+  connectToWebSocket(gameState.roomId);
+
+  showGameView();
+  updateUI();
+}
+
+// Find a quick match through the server's matchmaking queue
 function findQuickMatch() {
   // Generate random playerId if not exists
   if (!gameState.playerId) {
     gameState.playerId = generatePlayerId();
   }
 
-  // TODO: Implement matchmaking through the server
-  // For now just create a room
-  createRoom();
+  autoMatchBtn.innerHTML =
+    '<i class="fas fa-spinner fa-spin"></i> Finding opponent...';
+  autoMatchBtn.disabled = true;
+  lobbyMessage.textContent = "";
+
+  const [boardSize, winLength] = boardSizeSelect.value.split(":").map(Number);
+  const resetButton = () => {
+    autoMatchBtn.innerHTML = '<i class="fas fa-bolt"></i> Quick Match';
+    autoMatchBtn.disabled = false;
+  };
+
+  const checkResponse = (response) => {
+    if (!response.ok) {
+      throw new Error("Matchmaking failed");
+    }
+    return response.json();
+  };
+
+  // Enqueueing returns at once, then poll once a second until matched. The poll
+  // also picks the room up, so even a player matched right away polls once.
+  const waitForMatch = (data) => {
+    const delay = data.status === "matched" ? 0 : 1000;
+    if (data.status !== "matched") {
+      lobbyMessage.textContent = `Looking for an opponent... (position ${data.queue_position} of ${data.queue_depth})`;
+    }
+    return new Promise((resolve) => setTimeout(resolve, delay))
+      .then(() => fetch(`${API_URL}/matchmaking/${gameState.playerId}`))
+      .then(checkResponse)
+      .then((next) => (next.status === "matched" ? enterRoom(next) : waitForMatch(next)));
+  };
+
+  const enterRoom = (data) =>
+    fetch(`${API_URL}/rooms/${data.room_id}/state`)
+      .then((response) => response.json())
+      .then((room) => {
+        resetButton();
+        lobbyMessage.textContent = "";
+
+        gameState.roomId = data.room_id;
+        gameState.version = -1;
+        updateGameState(room.state);
+
+        connectToWebSocket(gameState.roomId);
+        showGameView();
+        updateUI();
+      });
+
+  fetch(`${API_URL}/matchmaking`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      player_id: gameState.playerId,
+      board_size: boardSize,
+      win_length: winLength,
+    }),
+  })
+    .then(checkResponse)
+    .then(waitForMatch)
+    .catch((error) => {
+      console.error("Error finding a match:", error);
+      resetButton();
+      lobbyMessage.textContent = "Failed to find a match. Please try again.";
+    });
 }
 
 // Connect to the WebSocket for a specific room
@@ -296,14 +437,18 @@ function connectToWebSocket(roomId) {
 
   // Determine WebSocket URL
   const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
-  const wsUrl = `${protocol}//localhost:8000/ws/rooms/${roomId}`;
+  const role = gameState.spectating ? "?role=spectator" : "";
+  const wsUrl = `${protocol}//localhost:8000/ws/rooms/${roomId}${role}`;
 
   socket = new WebSocket(wsUrl);
 
   socket.onopen = () => {
     console.log("WebSocket connection established");
     // Request latest state immediately after connection is established
-    socket.send(JSON.stringify({ action: "get_state" }));
+    // (spectators get a snapshot without asking)
+    if (!gameState.spectating) {
+      socket.send(JSON.stringify({ action: "get_state" }));
+    }
   };
 
   socket.onmessage = (event) => {
@@ -326,7 +471,7 @@ function connectToWebSocket(roomId) {
     clearInterval(gameState.timerInterval);
 
     // Try to reconnect in case of unexpected disconnection
-    if (gameState.roomId && gameState.gameStatus !== "finished") {
+    if (gameState.roomId && !isRoomClosed()) {
       console.log("Attempting to reconnect...");
       setTimeout(() => connectToWebSocket(gameState.roomId), 2000);
     }
@@ -351,9 +496,6 @@ function handleWebSocketMessage(message) {
     case "player_joined":
       // Another player joined the room
       console.log("Player joined event received");
-
-      // Force immediate REST API state sync as well for reliability
-      forceSyncGameState();
       break;
 
     case "move_made":
@@ -365,6 +507,19 @@ function handleWebSocketMessage(message) {
       console.log("State update event received");
       break;
 
+    case "snapshot":
+      // Full state that (re)starts the delta stream, already applied above
+      break;
+
+    case "delta":
+      applyDelta(message);
+      break;
+
+    case "ping":
+      // Heartbeat, the server closes connections that stop answering
+      socket.send(JSON.stringify({ action: "pong" }));
+      break;
+
     case "error":
       // Error message from server
       gameStatus.textContent = message.message;
@@ -375,13 +530,76 @@ function handleWebSocketMessage(message) {
   }
 }
 
+// Finished games and expired lobbies get no more updates
+function isRoomClosed() {
+  return gameState.gameStatus === "finished" || gameState.gameStatus === "expired";
+}
+
+// Apply a delta update, asking for a snapshot if one was missed
+function applyDelta(message) {
+  if (message.prev_seq !== gameState.version) {
+    // Deltas we already have are ignored, a gap means we need a fresh snapshot
+    if (message.seq > gameState.version) {
+      socket.send(JSON.stringify({ action: "resync" }));
+    }
+    return;
+  }
+
+  message.changes.forEach((change) => {
+    switch (change.op) {
+      case "cell":
+        gameState.board[change.y][change.x] = change.mark;
+        break;
+      case "turn":
+        gameState.currentTurn = change.current_turn;
+        gameState.moveDeadlineMs = change.move_deadline_ms;
+        break;
+      case "status":
+        gameState.gameStatus = change.game_status;
+        gameState.winner = change.winner;
+        break;
+      case "players":
+        gameState.players = change.players;
+        break;
+      case "match":
+        gameState.bestOf = change.best_of;
+        gameState.gameNumber = change.game_number;
+        gameState.scores = change.scores;
+        gameState.rematchRequests = change.rematch_requests;
+        break;
+    }
+  });
+  gameState.version = message.seq;
+
+  updateTimer();
+  updateUI();
+}
+
+// Status line for spectators, in terms of marks instead of you/opponent
+function updateSpectatorStatus() {
+  const players = gameState.players || {};
+  gameStatus.className = "";
+  if (gameState.gameStatus === "waiting") {
+    gameStatus.textContent = "Waiting for players...";
+  } else if (gameState.gameStatus === "active") {
+    gameStatus.textContent = `${players[gameState.currentTurn]}'s turn`;
+  } else if (gameState.gameStatus === "finished") {
+    gameStatus.textContent = gameState.winner
+      ? `${players[gameState.winner]} wins!`
+      : "It's a draw!";
+  } else if (gameState.gameStatus === "expired") {
+    gameStatus.textContent = "Room closed, nobody joined";
+  }
+}
+
 // Make a move on the board
 function makeMove(x, y) {
   // Verify it's player's turn and valid move
   if (
     gameState.gameStatus !== "active" ||
     gameState.currentTurn !== gameState.playerId ||
-    gameState.board[y][x] !== null
+    gameState.board[y][x] !== null ||
+    gameState.moveInFlight
   ) {
     // If invalid move, add subtle shake animation to the cell
     if (gameState.gameStatus === "active") {
@@ -396,24 +614,39 @@ function makeMove(x, y) {
     return;
   }
 
-  // Send move to server
-  fetch(`${API_URL}/rooms/${gameState.roomId}/move`, {
-    method: "POST",
-    headers: {
-      "Content-Type": "application/json",
-    },
-    body: JSON.stringify({
-      player_id: gameState.playerId,
-      x: x,
-      y: y,
-    }),
-  })
+  // Send move to server, ignoring further clicks until it is answered
+  gameState.moveInFlight = true;
+  const moveId = generateMoveId();
+  const send = (retriesLeft) =>
+    fetch(`${API_URL}/rooms/${gameState.roomId}/move`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({
+        player_id: gameState.playerId,
+        x: x,
+        y: y,
+        move_id: moveId,
+      }),
+    }).catch((error) => {
+      // No response at all: the move may or may not have been applied, resending the ID is safe
+      if (retriesLeft > 0) {
+        return send(retriesLeft - 1);
+      }
+      throw error;
+    });
+
+  send(MOVE_RETRIES)
     .then((response) => {
       if (!response.ok) {
         throw new Error("Failed to make move");
       }
       return response.json();
     })
+    .finally(() => {
+      gameState.moveInFlight = false;
+    })
     .then((data) => {
       // Update game state from response
       updateGameState(data.state);
@@ -432,6 +665,12 @@ function makeMove(x, y) {
 
 // Update the game state based on server data
 function updateGameState(state) {
+  // The server pushes every change, so ignore responses that arrive after a newer state
+  if (state.version !== undefined) {
+    if (state.version < gameState.version) return;
+    gameState.version = state.version;
+  }
+
   // Update the board
   gameState.board = state.board;
 
@@ -445,7 +684,13 @@ function updateGameState(state) {
   gameState.gameStatus = state.game_status;
   gameState.currentTurn = state.current_turn;
   gameState.winner = state.winner;
-  gameState.moveDeadline = state.move_deadline;
+  gameState.moveDeadlineMs = state.move_deadline_ms;
+
+  // Update match progress
+  gameState.bestOf = state.best_of || 1;
+  gameState.gameNumber = state.game_number || 1;
+  gameState.scores = state.scores || {};
+  gameState.rematchRequests = state.rematch_requests || [];
 
   // Update timer if needed
   updateTimer();
@@ -457,7 +702,9 @@ function updateUI() {
   roomIdDisplay.textContent = gameState.roomId || "";
 
   // Update player mark display
-  if (gameState.playerMark) {
+  if (gameState.spectating) {
+    playerMark.textContent = "You are spectating";
+  } else if (gameState.playerMark) {
     const markSymbol = gameState.playerMark === "X" ? "X" : "O";
     const markColor = gameState.playerMark === "X" ? "#e74c3c" : "#3498db";
     playerMark.innerHTML = `You are playing as <span style="color: ${markColor}; font-size: 24px;">${markSymbol}</span>`;
@@ -466,7 +713,9 @@ function updateUI() {
   }
 
   // Update game status text
-  if (gameState.gameStatus === "waiting") {
+  if (gameState.spectating) {
+    updateSpectatorStatus();
+  } else if (gameState.gameStatus === "waiting") {
     gameStatus.textContent = "Waiting for opponent...";
     gameStatus.className = "";
   } else if (gameState.gameStatus === "active") {
@@ -498,11 +747,23 @@ function updateUI() {
       playSound("lose");
     }
 
-    // Show the play again button
+    // Play again once the match is over, the next game of a match starts on its own
+    if (isMatchDecided()) {
+      newGameBtn.classList.remove("hidden");
+    }
+  } else if (gameState.gameStatus === "expired") {
+    gameStatus.textContent = "Nobody joined in time, the room was closed";
+    gameStatus.className = "";
     newGameBtn.classList.remove("hidden");
   }
+  if (!isRoomClosed()) {
+    newGameBtn.classList.add("hidden");
+  }
+
+  updateMatchScore();
 
   // Update the game board
+  renderBoard(gameState.board.length);
   boardCells.forEach((cell) => {
     const x = parseInt(cell.getAttribute("data-x"));
     const y = parseInt(cell.getAttribute("data-y"));
@@ -532,7 +793,7 @@ function updateUI() {
   // Handle timer display
   if (
     gameState.gameStatus === "active" &&
-    gameState.moveDeadline &&
+    gameState.moveDeadlineMs &&
     gameState.currentTurn === gameState.playerId
   ) {
     // Show timer
@@ -549,6 +810,52 @@ function updateUI() {
   }
 }
 
+// Whether the best-of-N match in this room is over
+function isMatchDecided() {
+  const winsNeeded = Math.floor(gameState.bestOf / 2) + 1;
+  return (
+    gameState.gameNumber >= gameState.bestOf ||
+    Object.values(gameState.scores).some((wins) => wins >= winsNeeded)
+  );
+}
+
+// Show the match score for best-of-N matches and pending rematch requests
+function updateMatchScore() {
+  const players = Object.keys(gameState.players || {});
+  if (gameState.bestOf <= 1 && gameState.rematchRequests.length === 0) {
+    matchScore.classList.add("hidden");
+    return;
+  }
+
+  const scores = players
+    .map((pid) => `${gameState.players[pid]}: ${gameState.scores[pid] || 0}`)
+    .join(" - ");
+  let text = `Game ${gameState.gameNumber} of ${gameState.bestOf} (${scores})`;
+  if (gameState.rematchRequests.length > 0) {
+    text += ` · Rematch requested ${gameState.rematchRequests.length}/${players.length}`;
+  }
+  matchScore.textContent = text;
+  matchScore.classList.remove("hidden");
+}
+
+// Ask for a rematch in the current room, or start a new room from the lobby
+function playAgain() {
+  if (
+    !gameState.roomId ||
+    gameState.spectating ||
+    !socket ||
+    socket.readyState !== WebSocket.OPEN
+  ) {
+    createRoom();
+    return;
+  }
+
+  socket.send(
+    JSON.stringify({ action: "rematch", player_id: gameState.playerId })
+  );
+  newGameBtn.classList.add("hidden");
+}
+
 // Update the move timer
 function updateTimer() {
   // Clear any existing timer
@@ -565,33 +872,37 @@ function updateTimer() {
     return;
   }
 
-  // Calculate time remaining (in seconds)
-  if (gameState.moveDeadline) {
-    const now = Math.floor(Date.now() / 1000);
-    // Parse the ISO format deadline string to timestamp
-    const deadlineDate = new Date(gameState.moveDeadline);
-    const deadline = Math.floor(deadlineDate.getTime() / 1000);
-    const remaining = isNaN(deadline) ? 30 : Math.max(0, deadline - now);
+  if (gameState.moveDeadlineMs) {
+    const deadline = gameState.moveDeadlineMs;
 
-    // Update timer display
-    timeLeft.textContent = remaining;
-
-    // Start countdown
-    gameState.timerInterval = setInterval(() => {
-      const now = Math.floor(Date.now() / 1000);
-      const remaining = Math.max(0, deadline - now);
-
-      timeLeft.textContent = remaining;
+    // Recomputed from the deadline on every tick rather than counted down,
+    // so late or throttled ticks never make the display drift
+    const tick = () => {
+      const remainingMs = Math.max(0, deadline - Date.now());
+      timeLeft.textContent = formatTimeLeft(remainingMs);
 
       // Stop at 0
-      if (remaining <= 0) {
+      if (remainingMs <= 0) {
         clearInterval(gameState.timerInterval);
         gameState.timerInterval = null;
       }
-    }, 1000);
+    };
+
+    tick();
+    // Several ticks a second, so the display turns over close to each whole second
+    gameState.timerInterval = setInterval(tick, 250);
   }
 }
 
+// Seconds left, as m:ss once chess clocks run over a minute
+function formatTimeLeft(remainingMs) {
+  const seconds = Math.ceil(remainingMs / 1000);
+  if (seconds < 60) {
+    return String(seconds);
+  }
+  return `${Math.floor(seconds / 60)}:${String(seconds % 60).padStart(2, "0")}`;
+}
+
 // Switch to game view
 function showGameView() {
   lobbyView.classList.add("hidden");
@@ -608,6 +919,12 @@ function goToLobby() {
   gameState.currentTurn = null;
   gameState.gameStatus = "waiting";
   gameState.winner = null;
+  gameState.version = -1;
+  gameState.spectating = false;
+  gameState.bestOf = 1;
+  gameState.gameNumber = 1;
+  gameState.scores = {};
+  gameState.rematchRequests = [];
 
   // Clear any timers
   if (gameState.timerInterval) {
@@ -628,6 +945,7 @@ function goToLobby() {
   roomIdInput.value = "";
   lobbyMessage.textContent = "";
   newGameBtn.classList.add("hidden");
+  matchScore.classList.add("hidden");
 }
 
 // Copy room ID to clipboard
@@ -653,6 +971,14 @@ function generatePlayerId() {
   return "player-" + Math.random().toString(36).substring(2, 10);
 }
 
+// Generate an ID for one move, reused by its retries
+function generateMoveId() {
+  if (window.crypto && window.crypto.randomUUID) {
+    return window.crypto.randomUUID();
+  }
+  return "move-" + Date.now().toString(36) + Math.random().toString(36).substring(2, 10);
+}
+
 // Play sound effects
 function playSound(type) {
   // Simple beep sounds for now, could be replaced with actual audio files